@@ -0,0 +1 @@
+from .alert import *
@@ -0,0 +1,245 @@
+import atexit
+import queue
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Maximum number of alerts waiting for the sinks, the next ones are dropped
+ALERT_QUEUE_SIZE = 1000
+
+
+class Alert:
+    """ An occupancy event: "alert" when the parking lot becomes almost full, "clear" when it recovers. """
+
+    def __init__(self, kind, av_spaces, spaces, time=None):
+        """ Initializes a new Alert object.
+
+        PRE:
+            - `kind` is "alert" or "clear".
+            - `av_spaces` and `spaces` are the available and total spaces when the event happened.
+        POST: An Alert object is initialized with the specified or default values.
+        """
+        self._kind = kind
+        self._av_spaces = av_spaces
+        self._spaces = spaces
+        self._time = datetime.now() if time is None else time
+
+    @property
+    def kind(self):
+        return self._kind
+
+    @property
+    def av_spaces(self):
+        return self._av_spaces
+
+    @property
+    def time(self):
+        return self._time
+
+    def __str__(self):
+        """ Returns a string representation of the Alert object.
+
+        PRE: None.
+        POST: The string representation of the Alert object.
+        """
+        if self._kind == 'clear':
+            return f"Clear: The car park has {self._av_spaces} spaces available again."
+        return f"Alert: The car park is almost full! There are only {self._av_spaces} spaces available."
+
+
+class PrintSink:
+    """ Prints the alerts in the terminal. """
+
+    def send(self, alert):
+        print(alert)
+
+
+class FileSink:
+    """ Appends the alerts to a text file, one line per alert. """
+
+    def __init__(self, path):
+        self._path = path
+
+    def send(self, alert):
+        with open(self._path, 'a', encoding='utf-8') as f:
+            f.write(f"{alert.time.isoformat()} {alert}\n")
+
+
+class SocketSink:
+    """ Sends the alerts as datagrams to a local socket: a (host, port) tuple for UDP, or a path for a Unix socket. """
+
+    def __init__(self, address):
+        self._address = address
+        self._socket = socket.socket(socket.AF_UNIX if isinstance(address, str) else socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, alert):
+        self._socket.sendto(f"{alert.kind};{alert.av_spaces};{alert.time.timestamp()}".encode('utf-8'), self._address)
+
+
+class CallbackSink:
+    """ Calls a function with every alert. """
+
+    def __init__(self, callback):
+        self._callback = callback
+
+    def send(self, alert):
+        self._callback(alert)
+
+
+class AlertDispatcher:
+    """ Delivers the alerts to the sinks from a background thread, so a slow sink never slows down the caller. """
+
+    def __init__(self, sinks=None, size=ALERT_QUEUE_SIZE):
+        """ Initializes a new AlertDispatcher object.
+
+        PRE:
+            - `sinks` is a list of objects with a `send(alert)` method (default: [PrintSink()]).
+            - `size` is the maximum number of alerts waiting in the queue.
+        POST: The dispatcher is ready, its thread is started with the first alert.
+        """
+        self._sinks = [PrintSink()] if sinks is None else sinks
+        self._queue = queue.Queue(size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def put(self, alert):
+        """ Queues an alert without waiting.
+
+        PRE: `alert` is an Alert object.
+        POST: The alert is queued, or counted in `dropped` if the queue is full.
+        """
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(alert)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='alert-dispatcher', daemon=True)
+                self._thread.start()
+                # A short-lived process (main.py) still delivers its alerts before exiting
+                atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            alert = self._queue.get()
+            if alert is None:
+                break
+            for sink in self._sinks:
+                try:
+                    sink.send(alert)
+                except Exception as e:
+                    print(f"The alert could not be sent to {type(sink).__name__}: {e}", file=sys.stderr)
+
+    def close(self, timeout=5):
+        """ Delivers the queued alerts and stops the thread.
+
+        PRE: `timeout` is the maximum number of seconds to wait for the sinks.
+        POST: The thread is stopped (or still running after `timeout`), the next alert restarts it.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+            atexit.unregister(self.close)
+
+
+class OccupancyMonitor:
+    """ Turns the occupancy of the parking lot into alerts, with hysteresis and rate limiting.
+
+    An alert is sent when the ratio of available spaces crosses `threshold` downwards,
+    and a clear is sent once it recovers above `clear_threshold`.
+    """
+
+    def __init__(self, dispatcher=None, threshold=0.1, clear_threshold=0.15, min_interval=60):
+        """ Initializes a new OccupancyMonitor object.
+
+        PRE:
+            - `dispatcher` is an AlertDispatcher (default: one printing the alerts).
+            - 0 <= `threshold` <= `clear_threshold` <= 1.
+            - `min_interval` is the minimum number of seconds between two events.
+        POST: The monitor is initialized, not in alert.
+        RAISE: ValueError if `clear_threshold` is lower than `threshold`.
+        """
+        if clear_threshold < threshold:
+            raise ValueError('clear_threshold must be greater than or equal to threshold.')
+        self._dispatcher = AlertDispatcher() if dispatcher is None else dispatcher
+        self._threshold = threshold
+        self._clear_threshold = clear_threshold
+        self._min_interval = min_interval
+        self._alerted = False
+        self._last_event = None
+
+    @property
+    def dispatcher(self):
+        return self._dispatcher
+
+    @property
+    def alerted(self):
+        return self._alerted
+
+    def reset(self, av_spaces, spaces):
+        """ Sets the state from the current occupancy without sending anything.
+
+        PRE: `av_spaces` and `spaces` are integers, `spaces` >= 0.
+        POST: The monitor is in alert if the ratio of available spaces is below the threshold (always if `spaces` is 0).
+        """
+        self._alerted = self._ratio(av_spaces, spaces) <= self._threshold
+
+    def to_dict(self):
+        """ Transforms the state of the monitor to a dictionary, to keep the hysteresis and the rate limit between two runs.
+
+        PRE: None.
+        POST: A dictionary with the keys "alerted" and "last_event" (timestamp or None).
+        """
+        return {
+            "alerted": self._alerted,
+            "last_event": self._last_event
+        }
+
+    def load(self, data):
+        """ Restores the state saved by `to_dict`, instead of `reset`.
+
+        PRE: data is a dictionary returned by `to_dict`.
+        POST: The monitor is in the saved state.
+        """
+        self._alerted = data['alerted']
+        self._last_event = data['last_event']
+
+    @staticmethod
+    def _ratio(av_spaces, spaces):
+        # A parking lot without spaces is always full
+        return av_spaces / spaces if spaces else 0.0
+
+    def update(self, av_spaces, spaces):
+        """ Checks the occupancy after a car entered or left.
+
+        PRE: `av_spaces` and `spaces` are integers, `spaces` >= 0.
+        POST:
+            - An Alert is queued if the threshold (or the clear threshold) has been crossed,
+              unless the previous event is more recent than `min_interval` (it is then retried on the next update).
+            - Returns the queued Alert, or None.
+        """
+        ratio = self._ratio(av_spaces, spaces)
+        if self._alerted:
+            kind = 'clear' if ratio > self._clear_threshold else None
+        else:
+            kind = 'alert' if ratio <= self._threshold else None
+        if kind is None:
+            return None
+        # Wall clock time, so that the saved state is still valid in the next run
+        now = time.time()
+        if self._last_event is not None and now - self._last_event < self._min_interval:
+            return None
+        self._last_event = now
+        self._alerted = kind == 'alert'
+        alert = Alert(kind, av_spaces, spaces)
+        self._dispatcher.put(alert)
+        return alert
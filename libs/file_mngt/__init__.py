@@ -1 +1,5 @@
-from .json_mngt import *
\ No newline at end of file
+from .json_mngt import *
+from .archive_mngt import *
+from .log_mngt import *
+from .csv_mngt import *
+from .shard_mngt import *
@@ -0,0 +1,74 @@
+import gzip
+import json
+import lzma
+import os
+from datetime import datetime
+
+ARCHIVE_DIR = 'data/archive'
+# Tickets older than this number of days are moved out of data/data.json
+ARCHIVE_HORIZON_DAYS = 365
+# "gzip" (faster) or "lzma" (smaller)
+ARCHIVE_COMPRESSION = 'gzip'
+
+SEGMENT_FORMATS = {
+    'gzip': (gzip.open, '.jsonl.gz'),
+    'lzma': (lzma.open, '.jsonl.xz')
+}
+
+
+def segment_name(arrival, compression=ARCHIVE_COMPRESSION):
+    """ Returns the name of the segment file holding the tickets of the month of `arrival`.
+
+    PRE: `arrival` is a timestamp, `compression` is a key of SEGMENT_FORMATS.
+    POST: A file name such as "tickets-2024-11.jsonl.gz".
+    """
+    return f"tickets-{datetime.fromtimestamp(arrival).strftime('%Y-%m')}{SEGMENT_FORMATS[compression][1]}"
+
+
+def archive_writer(tickets, directory=ARCHIVE_DIR, compression=ARCHIVE_COMPRESSION):
+    """ Appends tickets to the compressed monthly segments of the archive.
+
+    PRE:
+        - `tickets` is a list of Ticket objects.
+        - `compression` is a key of SEGMENT_FORMATS.
+    POST:
+        - Every ticket is written as one JSON line in the segment of its arrival month.
+        - Returns the number of archived tickets.
+    RAISE: ValueError if the compression is unknown.
+    """
+    if compression not in SEGMENT_FORMATS:
+        raise ValueError(f'Unknown compression {compression}, choose one of {list(SEGMENT_FORMATS)}.')
+    segments = {}
+    for ticket in tickets:
+        data = ticket.to_dict()
+        segments.setdefault(segment_name(data['arrival'], compression), []).append(data)
+
+    os.makedirs(directory, exist_ok=True)
+    opener = SEGMENT_FORMATS[compression][0]
+    for name, records in segments.items():
+        # Appending adds a new compressed member/stream, both formats read them back as one file
+        with opener(os.path.join(directory, name), 'at', encoding='utf-8') as f:
+            for data in records:
+                f.write(json.dumps(data) + '\n')
+    return sum(map(len, segments.values()))
+
+
+def archive_reader(directory=ARCHIVE_DIR, start=None, end=None):
+    """ Reads the archived tickets one by one, segment after segment.
+
+    PRE: `start` and `end` are datetime objects or None, used to skip the segments outside of [start, end].
+    POST: Yields the archived ticket dictionaries in chronological order of the segments.
+    """
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(os.listdir(directory)):
+        for opener, extension in SEGMENT_FORMATS.values():
+            if name.startswith('tickets-') and name.endswith(extension):
+                month = name[len('tickets-'):-len(extension)]
+                if start is not None and month < start.strftime('%Y-%m'):
+                    break
+                if end is not None and month > end.strftime('%Y-%m'):
+                    break
+                with opener(os.path.join(directory, name), 'rt', encoding='utf-8') as f:
+                    for line in f:
+                        yield json.loads(line)
@@ -0,0 +1,86 @@
+import csv
+import gzip
+from datetime import datetime
+from itertools import islice
+
+# Number of rows built and written at once
+EXPORT_CHUNK_SIZE = 10000
+
+TICKET_HEADER = ['plate', 'arrival', 'departure']
+STAY_HEADER = ['plate', 'arrival', 'departure', 'amount']
+REPORT_HEADER = ['table', 'key', 'cars']
+
+
+def _date(timestamp):
+    return '' if timestamp is None else datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _in_range(timestamp, start, end):
+    return (start is None or timestamp >= start.timestamp()) and (end is None or timestamp < end.timestamp())
+
+
+def ticket_rows(parking, archived=(), start=None, end=None):
+    """ Yields the tickets of the parking lot, then the archived ones, as CSV rows.
+
+    PRE:
+        - `parking` is a Parking object.
+        - `archived` is an iterable of archived ticket dictionaries (see `archive_reader`).
+        - `start` and `end` are datetime objects or None, only the tickets arrived in [start, end[ are kept.
+    POST: Yields [plate, arrival, departure] lists.
+    """
+    for car in parking.all_cars:
+        for ticket in car.tickets:
+            data = ticket.to_dict()
+            if _in_range(data['arrival'], start, end):
+                yield [data['plate'], _date(data['arrival']), _date(data['departure'])]
+    for data in archived:
+        if _in_range(data['arrival'], start, end):
+            yield [data['plate'], _date(data['arrival']), _date(data.get('departure'))]
+
+
+def stay_rows(log, start=None, end=None):
+    """ Yields the completed stays of the ticket log as CSV rows, read from the mapped file.
+
+    PRE:
+        - `log` is an opened TicketLog.
+        - `start` and `end` are datetime objects or None, only the stays arrived in [start, end[ are kept.
+    POST: Yields [plate, arrival, departure, amount] lists.
+    """
+    for plate, amount, arrival, departure in log:
+        if _in_range(arrival, start, end):
+            yield [plate, _date(arrival), _date(departure), amount]
+
+
+def report_rows(report):
+    """ Yields the tables of a report as CSV rows.
+
+    PRE: `report` is a Report object with its data added.
+    POST: Yields ["day", date, cars] lists, then ["hour", hour, cars] lists.
+    """
+    vehicle_count_per_day, peak_hours = report.get_daily_report()
+    for day in sorted(vehicle_count_per_day):
+        yield ['day', day.isoformat(), vehicle_count_per_day[day]]
+    for hour in sorted(peak_hours):
+        yield ['hour', hour, peak_hours[hour]]
+
+
+def csv_writer(path, header, rows, compress=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """ Writes rows to a CSV file chunk by chunk, so only one chunk is in memory at a time.
+
+    PRE:
+        - `header` is the list of the column names.
+        - `rows` is an iterable (usually a generator) of lists.
+        - `compress` is True to write a gzip file.
+    POST: Returns the number of rows written (the header excluded).
+    """
+    written = 0
+    rows = iter(rows)
+    with (gzip.open(path, 'wt', encoding='utf-8', newline='') if compress else open(path, 'w', encoding='utf-8', newline='')) as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        chunk = list(islice(rows, chunk_size))
+        while chunk:
+            writer.writerows(chunk)
+            written += len(chunk)
+            chunk = list(islice(rows, chunk_size))
+    return written
@@ -1,11 +1,11 @@
 import json
 
-def json_reader():
-    with open('data/data.json', 'r', encoding="utf-8") as f:
+def json_reader(path='data/data.json'):
+    with open(path, 'r', encoding="utf-8") as f:
         data = json.load(f)
     return data
 
-def json_writer(data):
-    with open('data/data.json', 'w', encoding="utf-8") as f:
+def json_writer(data, path='data/data.json'):
+    with open(path, 'w', encoding="utf-8") as f:
         json.dump(data.to_dict(), f, ensure_ascii=False, indent=4)
 
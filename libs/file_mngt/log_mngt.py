@@ -0,0 +1,180 @@
+import math
+import mmap
+import os
+import struct
+from collections import Counter
+
+try:
+    import numpy
+except ImportError:  # numpy is optional, the log is then scanned with struct
+    numpy = None
+
+TICKET_LOG = 'data/tickets.bin'
+# Size in bytes of the plate in a record (UTF-8, zero padded), longer plates can't be logged
+PLATE_WIDTH = 12
+# One completed stay: plate, amount paid in euros, arrival and departure timestamps
+# (NaN for the stays backfilled from tickets saved before the departures were recorded)
+RECORD = struct.Struct(f'<{PLATE_WIDTH}sIdd')
+RECORD_DTYPE = None if numpy is None else numpy.dtype([
+    ('plate', f'S{PLATE_WIDTH}'),
+    ('amount', '<u4'),
+    ('arrival', '<f8'),
+    ('departure', '<f8')
+])
+
+
+class TicketLog:
+    """ Append-only binary file of fixed-width records, one per completed stay.
+
+    Opened with `with`, the file is mapped in memory: the records are read through the page cache,
+    shared by every process reading the log, without building any Ticket object.
+    """
+
+    def __init__(self, path=TICKET_LOG):
+        """ Initializes a new TicketLog object.
+
+        PRE: `path` is the path of the log file (it may not exist yet).
+        POST: The log is ready to be appended or opened.
+        """
+        self._path = path
+        self._file = None
+        self._mmap = None
+
+    def append(self, ticket, amount):
+        """ Appends a completed stay at the end of the log.
+
+        PRE:
+            - `ticket` is a closed Ticket object (with a departure).
+            - `amount` is the amount paid for the stay, in euros.
+        POST: One record is written at the end of the file.
+        RAISE: ValueError if the plate is longer than PLATE_WIDTH bytes or the ticket is not closed.
+        """
+        data = ticket.to_dict()
+        plate = data['plate'].encode('utf-8')
+        if len(plate) > PLATE_WIDTH:
+            raise ValueError(f"The plate {data['plate']} is too long for the ticket log.")
+        if data['departure'] is None:
+            raise ValueError(f"The ticket of {data['plate']} is not closed.")
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self._path, 'ab') as f:
+            f.write(RECORD.pack(plate, int(amount), data['arrival'], data['departure']))
+
+    def backfill(self, stays):
+        """ Appends the stays that are not in the log yet, e.g. the history saved before the log existed.
+
+        PRE:
+            - The log is not opened with `with`.
+            - `stays` is an iterable of (plate, amount, arrival, departure) tuples (see `Parking.completed_stays`),
+              the departure being None if it is unknown.
+        POST:
+            - The stays whose plate and arrival are not already in the log are appended, by order of arrival.
+            - Returns a tuple (written, skipped), the skipped stays having a plate longer than PLATE_WIDTH bytes.
+        """
+        with TicketLog(self._path) as log:
+            logged = set(map(lambda r: (r[0], r[2]), log))
+        records, skipped = [], 0
+        for plate, amount, arrival, departure in sorted(stays, key=lambda s: s[2]):
+            if (plate, arrival) in logged:
+                continue
+            if len(plate.encode('utf-8')) > PLATE_WIDTH:
+                skipped += 1
+                continue
+            logged.add((plate, arrival))
+            records.append(RECORD.pack(plate.encode('utf-8'), int(amount), arrival, math.nan if departure is None else departure))
+        if records:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self._path, 'ab') as f:
+                f.write(b''.join(records))
+        return len(records), skipped
+
+    def __len__(self):
+        """ Returns the number of records of the log. """
+        if self._mmap is not None:
+            return len(self._mmap) // RECORD.size
+        return os.path.getsize(self._path) // RECORD.size if os.path.exists(self._path) else 0
+
+    def __enter__(self):
+        """ Maps the log file in memory (read only). """
+        if os.path.exists(self._path) and os.path.getsize(self._path) >= RECORD.size:
+            self._file = open(self._path, 'rb')
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """ Unmaps the log file.
+
+        PRE: The arrays returned by `as_array` are no longer used.
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+        self._mmap = None
+        self._file = None
+
+    @property
+    def records(self):
+        """ Returns a memoryview on the complete records of the mapped file (no copy).
+
+        PRE: The log is opened with `with`.
+        POST: A read-only memoryview, empty if the log is empty.
+        """
+        return self.records_from(0)
+
+    def records_from(self, start):
+        """ Returns a memoryview on the records of the mapped file from the record number `start` (no copy).
+
+        PRE: The log is opened with `with`, `start` >= 0.
+        POST: A read-only memoryview, empty if there is no record after `start`.
+        """
+        if self._mmap is None:
+            return memoryview(b'')
+        return memoryview(self._mmap)[min(start, len(self)) * RECORD.size:len(self) * RECORD.size]
+
+    def __iter__(self):
+        """ Yields (plate, amount, arrival, departure) for every record, read directly from the mapped file. """
+        return self.read(0)
+
+    def read(self, start):
+        """ Yields (plate, amount, arrival, departure) for every record from the record number `start`.
+
+        PRE: The log is opened with `with`, `start` >= 0.
+        POST: The departure is None if it is unknown.
+        """
+        for plate, amount, arrival, departure in RECORD.iter_unpack(self.records_from(start)):
+            yield plate.rstrip(b'\0').decode('utf-8'), amount, arrival, None if math.isnan(departure) else departure
+
+    def as_array(self, start=0):
+        """ Returns a numpy structured array viewing the mapped file from the record number `start` (no copy).
+
+        PRE: numpy is installed and the log is opened with `with`.
+        POST: An array of RECORD_DTYPE, only valid until the log is closed.
+        RAISE: ImportError if numpy is not installed.
+        """
+        if numpy is None:
+            raise ImportError('numpy is required to view the ticket log as an array.')
+        return numpy.frombuffer(self.records_from(start), dtype=RECORD_DTYPE)
+
+    def arrival_buckets(self, width):
+        """ Counts the arrivals per period of `width` seconds.
+
+        PRE: `width` is a positive number of seconds and the log is opened with `with`.
+        POST: A dictionary {bucket: count}, the bucket starting at `bucket * width`.
+        """
+        if numpy is not None:
+            buckets, counts = numpy.unique(self.as_array()['arrival'] // width, return_counts=True)
+            return dict(zip(map(int, buckets), map(int, counts)))
+        return dict(Counter(int(arrival // width) for _, _, arrival, _ in RECORD.iter_unpack(self.records)))
+
+    def revenue(self):
+        """ Returns the total amount paid for the logged stays.
+
+        PRE: The log is opened with `with`.
+        POST: The sum of the amounts, in euros.
+        """
+        if numpy is not None:
+            return int(self.as_array()['amount'].sum(dtype='u8'))
+        return sum(amount for _, amount, _, _ in RECORD.iter_unpack(self.records))
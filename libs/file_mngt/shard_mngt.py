@@ -0,0 +1,170 @@
+import json
+import os
+import zlib
+
+SHARD_DIR = 'data/shards'
+# Number of shard files the cars are spread over (fixed once the shards are written)
+SHARD_COUNT = 64
+MANIFEST = 'manifest.json'
+# Holds every file of a save before they are written, so that a save is applied completely or not at all
+JOURNAL = 'journal.json'
+# Parts of the state saved in their own file ("<part>.json"), only rewritten when they change
+STATE_PARTS = ['reservations', 'sub_schedule', 'alert_state']
+
+
+def shard_of(plate, count=SHARD_COUNT):
+    """ Returns the number of the shard holding a plate.
+
+    PRE: `plate` is a string, `count` is a positive integer.
+    POST: An integer in [0, count[, the same in every process (unlike `hash`).
+    """
+    return zlib.crc32(plate.encode('utf-8')) % count
+
+
+def _shard_name(shard):
+    return f"shard-{shard:03d}.json"
+
+
+def _shard_path(directory, shard):
+    return os.path.join(directory, _shard_name(shard))
+
+
+def _state_path(directory, part):
+    return os.path.join(directory, f"{part}.json")
+
+
+def _read(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r', encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write(path, data):
+    # Written next to the file then renamed: a reader sees the old or the new file, never half of one
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _commit(directory, files):
+    """ Writes several files as one change: the journal is the commit point, then every file is replaced. """
+    journal = os.path.join(directory, JOURNAL)
+    _write(journal, files)
+    _apply(directory, files)
+    os.remove(journal)
+
+
+def _apply(directory, files):
+    for name, data in files.items():
+        _write(os.path.join(directory, name), data)
+
+
+def _recover(directory):
+    """ Finishes the save interrupted by a crash, if any (the journal is complete, its files may not all be written). """
+    journal = os.path.join(directory, JOURNAL)
+    if os.path.exists(journal):
+        _apply(directory, _read(journal))
+        os.remove(journal)
+
+
+def shard_writer(parking, directory=SHARD_DIR, count=SHARD_COUNT):
+    """ Saves the parking lot in shards, only rewriting the shards of the cars changed since the last save.
+
+    PRE:
+        - `parking` is a Parking object.
+        - `count` is the number of shards of `directory` (ignored if the shards already exist).
+    POST:
+        - Every shard holding a dirty plate is rewritten, with the reservations, the subscription schedule
+          and the state of the alerts if they changed, and the manifest (spaces and plates of `cars_in`).
+        - The files are written as one change: after a crash, the next read or save applies all of them.
+        - All the shards are written if the directory has no manifest yet.
+        - The saved plates and parts of the state are cleared from the dirty ones of the parking lot.
+        - Returns the number of shards written.
+    """
+    dirty, dirty_state = parking.dirty, parking.dirty_state
+    if os.path.isdir(directory):
+        _recover(directory)
+    manifest = _read(os.path.join(directory, MANIFEST))
+    if manifest is None:
+        os.makedirs(directory, exist_ok=True)
+        plates = set(map(lambda c: c.plate, parking.all_cars))
+    else:
+        count = manifest['shards']
+        plates = dirty
+
+    shards = {}
+    for plate in plates:
+        shards.setdefault(shard_of(plate, count), []).append(plate)
+    if manifest is None:
+        # Empty shards are written too, so that every shard file exists
+        for shard in range(count):
+            shards.setdefault(shard, [])
+
+    files = {}
+    for shard, shard_plates in shards.items():
+        cars = {} if manifest is None else _read(_shard_path(directory, shard), {})
+        for plate in shard_plates:
+            car = parking.get_car(plate)
+            if car is None:
+                cars.pop(plate, None)
+            else:
+                cars[plate] = car.to_dict()
+        files[_shard_name(shard)] = cars
+
+    parts = list(filter(lambda p: p in dirty_state or not os.path.exists(_state_path(directory, p)), STATE_PARTS))
+    if parts:
+        state = parking.state_dict()
+        for part in parts:
+            files[f"{part}.json"] = state[part]
+
+    files[MANIFEST] = {**parking.to_manifest(), 'shards': count}
+    _commit(directory, files)
+    parking.clear_dirty(dirty, dirty_state)
+    return len(shards)
+
+
+def shard_reader(directory=SHARD_DIR, plates=None):
+    """ Loads the parking lot saved by `shard_writer`.
+
+    PRE:
+        - `directory` holds a manifest and its shards.
+        - `plates` is a list of plates, or None (default: every car is loaded).
+    POST: A dictionary in the format of `json_reader`, to be given to `Parking.from_dict`.
+          With `plates`, only the manifest, the reservations, the state of the alerts and the shards of
+          these plates are read: the other cars in the parking lot are only plates (without tickets nor
+          subscription) and the subscription schedule is not loaded. Such a parking lot is only meant
+          for gate events of these plates, saved with `shard_writer`.
+    RAISE: FileNotFoundError if there is no manifest.
+    """
+    _recover(directory)
+    with open(os.path.join(directory, MANIFEST), 'r', encoding="utf-8") as f:
+        manifest = json.load(f)
+    count = manifest.pop('shards')
+    parts = STATE_PARTS if plates is None else list(filter(lambda p: p != 'sub_schedule', STATE_PARTS))
+    for part in parts:
+        if os.path.exists(_state_path(directory, part)):
+            manifest[part] = _read(_state_path(directory, part))
+    cars = {}
+    for shard in range(count) if plates is None else set(map(lambda p: shard_of(p, count), plates)):
+        cars.update(_read(_shard_path(directory, shard), {}))
+    cars_in = manifest['cars_in']
+    parked = set(cars_in)
+    manifest['cars_in'] = list(map(lambda plate: cars.get(plate, {'plate': plate, 'tickets': [], 'sub': None}), cars_in))
+    manifest['cars_out'] = list(map(lambda plate: cars[plate], filter(lambda plate: plate not in parked, cars)))
+    return manifest
+
+
+def shard_car(plate, directory=SHARD_DIR):
+    """ Reads the saved car of a plate, only opening its shard.
+
+    PRE: `plate` is a string, `directory` holds a manifest and its shards.
+    POST: The dictionary of the car (see `Car.to_dict`), or None if the plate is unknown.
+    """
+    _recover(directory)
+    with open(os.path.join(directory, MANIFEST), 'r', encoding="utf-8") as f:
+        count = json.load(f)['shards']
+    return _read(_shard_path(directory, shard_of(plate, count)), {}).get(plate)
@@ -1 +1,6 @@
-from .parking import *
\ No newline at end of file
+from .parking import *
+from .plate_index import *
+from .reservation import *
+from .scheduler import *
+from .thread_safe import *
+from .forecast import *
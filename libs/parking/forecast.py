@@ -0,0 +1,234 @@
+from datetime import datetime
+
+try:
+    import numpy
+except ImportError:  # numpy is optional, the profiles are then built record by record
+    numpy = None
+
+FORECAST_FILE = 'data/forecast.json'
+# Longer stays are counted as stays of FORECAST_MAX_DWELL hours
+FORECAST_MAX_DWELL = 72
+# Maximum number of hours that can be predicted
+FORECAST_MAX_HOURS = 168
+# Below this number of stays, an hour of the week uses the durations of all the stays
+FORECAST_MIN_STAYS = 20
+WEEK_HOURS = 7 * 24
+# The arrivals are converted to local time per quarter of an hour (exact for every time zone offset)
+_BUCKET = 900
+
+
+def week_hour(timestamp):
+    """ Returns the hour of the week (0 = Monday 0h, 167 = Sunday 23h) of a timestamp, in local time. """
+    date = datetime.fromtimestamp(timestamp)
+    return date.weekday() * 24 + date.hour
+
+
+class Forecast:
+    """ Occupancy forecast built from the history of the completed stays.
+
+    For every hour of the week, the profile holds the number of arrivals and the histogram of the
+    durations (in whole hours) of the stays. It is updated incrementally from the ticket log: only
+    the records added since the last update are read. The predictions are cached until the parking
+    lot changes or the hour changes.
+    """
+
+    def __init__(self, records=0, arrivals=None, dwell=None, first=None, last=None):
+        """ Initializes a new Forecast object.
+
+        PRE:
+            - `records` is the number of records of the ticket log already in the profile.
+            - `arrivals` is a list of WEEK_HOURS integers, `dwell` a list of WEEK_HOURS lists of FORECAST_MAX_DWELL + 1 integers.
+            - `first` and `last` are the timestamps of the first and last arrivals of the profile, or None.
+        POST: A Forecast object is initialized with the specified or default (empty) profile.
+        """
+        self._records = records
+        self._arrivals = [0] * WEEK_HOURS if arrivals is None else arrivals
+        self._dwell = [[0] * (FORECAST_MAX_DWELL + 1) for _ in range(WEEK_HOURS)] if dwell is None else dwell
+        self._first = first
+        self._last = last
+        self._clear_cache()
+
+    @property
+    def records(self):
+        return self._records
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Transforms a dictionary into a Forecast object.
+
+        PRE: data is a dictionary with key-value pairs.
+        POST: The Forecast object is initialized with the specified profile.
+        """
+        return cls(data['records'], data['arrivals'], data['dwell'], data['first'], data['last'])
+
+    def to_dict(self):
+        """ Transforms a Forecast object to a dictionary.
+
+        PRE: None.
+        POST: The dictionary representation of the profile.
+        """
+        return {
+            "records": self._records,
+            "arrivals": self._arrivals,
+            "dwell": self._dwell,
+            "first": self._first,
+            "last": self._last
+        }
+
+    def _clear_cache(self):
+        self._rates = None
+        self._survival = None
+        self._future = {}
+        self._predictions = {}
+
+    def update(self, log):
+        """ Adds the records of the ticket log that are not yet in the profile.
+
+        PRE: `log` is an opened TicketLog.
+        POST: The profile includes every record of the log, the cached predictions are cleared.
+        """
+        if len(log) <= self._records:
+            return
+        if numpy is not None:
+            stays = log.as_array(self._records)
+            arrivals, departures = stays['arrival'], stays['departure']
+            # One datetime per quarter of an hour instead of one per stay
+            buckets, inverse = numpy.unique((arrivals // _BUCKET).astype('i8'), return_inverse=True)
+            hours = numpy.array(list(map(lambda b: week_hour(int(b) * _BUCKET), buckets)), dtype='i8')[inverse.ravel()]
+            # The stays with an unknown departure (NaN) are only counted as arrivals
+            known = ~numpy.isnan(departures)
+            durations = numpy.clip((departures[known] - arrivals[known]) // 3600, 0, FORECAST_MAX_DWELL).astype('i8')
+            new_arrivals = numpy.bincount(hours, minlength=WEEK_HOURS).tolist()
+            new_dwell = numpy.bincount(hours[known] * (FORECAST_MAX_DWELL + 1) + durations, minlength=WEEK_HOURS * (FORECAST_MAX_DWELL + 1))
+            new_dwell = new_dwell.reshape(WEEK_HOURS, FORECAST_MAX_DWELL + 1).tolist()
+            first, last = float(arrivals.min()), float(arrivals.max())
+        else:
+            new_arrivals = [0] * WEEK_HOURS
+            new_dwell = [[0] * (FORECAST_MAX_DWELL + 1) for _ in range(WEEK_HOURS)]
+            bucket_hours = {}
+            first, last = None, None
+            for _, _, arrival, departure in log.read(self._records):
+                bucket = int(arrival // _BUCKET)
+                if bucket not in bucket_hours:
+                    bucket_hours[bucket] = week_hour(bucket * _BUCKET)
+                hour = bucket_hours[bucket]
+                new_arrivals[hour] += 1
+                if departure is not None:
+                    new_dwell[hour][int(min(max((departure - arrival) // 3600, 0), FORECAST_MAX_DWELL))] += 1
+                first = arrival if first is None else min(first, arrival)
+                last = arrival if last is None else max(last, arrival)
+
+        for hour in range(WEEK_HOURS):
+            self._arrivals[hour] += new_arrivals[hour]
+            self._dwell[hour] = list(map(sum, zip(self._dwell[hour], new_dwell[hour])))
+        self._first = first if self._first is None else min(self._first, first)
+        self._last = last if self._last is None else max(self._last, last)
+        self._records = len(log)
+        self._clear_cache()
+
+    def arrival_rates(self):
+        """ Returns the mean number of arrivals for every hour of the week.
+
+        PRE: None.
+        POST: A list of WEEK_HOURS floats (all 0 if the profile is empty).
+        """
+        if self._rates is None:
+            self._rates = [0.0] * WEEK_HOURS
+            if self._first is not None:
+                # Number of times each hour of the week appears between the first and the last arrival
+                hours = int(self._last // 3600 - self._first // 3600) + 1
+                first_hour = week_hour(self._first)
+                for hour in range(WEEK_HOURS):
+                    seen = hours // WEEK_HOURS + (1 if (hour - first_hour) % WEEK_HOURS < hours % WEEK_HOURS else 0)
+                    self._rates[hour] = self._arrivals[hour] / seen if seen else 0.0
+        return self._rates
+
+    def survival(self, hour):
+        """ Returns the probability that a car arrived at an hour of the week is still there after d hours.
+
+        PRE: 0 <= `hour` < WEEK_HOURS.
+        POST: A list of FORECAST_MAX_DWELL + 2 floats, for d = 0 to FORECAST_MAX_DWELL + 1.
+        """
+        if self._survival is None:
+            pooled = self._survival_of(list(map(sum, zip(*self._dwell))))
+            self._survival = list(map(
+                lambda h: self._survival_of(self._dwell[h]) if sum(self._dwell[h]) >= FORECAST_MIN_STAYS else pooled,
+                range(WEEK_HOURS)
+            ))
+        return self._survival[hour]
+
+    @staticmethod
+    def _survival_of(histogram):
+        total = sum(histogram)
+        if total == 0:
+            return [1.0] + [0.0] * (FORECAST_MAX_DWELL + 1)
+        survival = [1.0]
+        remaining = total
+        for count in histogram:
+            remaining -= count
+            survival.append(remaining / total)
+        # The longest stays are capped, those cars are expected to stay
+        survival[-1] = survival[-2]
+        return survival
+
+    def _survives(self, hour, elapsed, hours):
+        survival = self.survival(hour)
+        last = len(survival) - 1
+        start = survival[min(elapsed, last)]
+        if start == 0:
+            # Longer than every stay seen so far: the car is expected to stay
+            return 1.0
+        return survival[min(elapsed + hours, last)] / start
+
+    def _future_arrivals(self, start_hour):
+        """ Returns the expected number of cars, arrived from now on, present after k hours (k = 1 to FORECAST_MAX_HOURS). """
+        if start_hour not in self._future:
+            rates = self.arrival_rates()
+            self._future[start_hour] = [
+                sum(rates[(start_hour + j) % WEEK_HOURS] * self._survives((start_hour + j) % WEEK_HOURS, 0, k - j) for j in range(k))
+                for k in range(1, FORECAST_MAX_HOURS + 1)
+            ]
+        return self._future[start_hour]
+
+    def predict(self, parking, hours=24, now=None):
+        """ Predicts the occupancy of the parking lot for the next hours.
+
+        PRE:
+            - `parking` is a Parking object.
+            - 1 <= `hours` <= FORECAST_MAX_HOURS.
+            - `now` is a datetime object or None (default: now).
+        POST: A list of `hours` expected numbers of occupied spaces (cars and reservations), one per hour from now.
+        RAISE: ValueError if `hours` is out of range.
+        """
+        if not 1 <= hours <= FORECAST_MAX_HOURS:
+            raise ValueError(f'The forecast is limited to {FORECAST_MAX_HOURS} hours.')
+        now = datetime.now() if now is None else now
+        key = (id(parking), parking.version, int(now.timestamp() // 3600))
+        if len(self._predictions.get(key, [])) < hours:
+            self._predictions[key] = self._predict(parking, now, hours)
+        return self._predictions[key][:hours]
+
+    def _predict(self, parking, now, hours):
+        # The cars in the parking lot are grouped by hour of arrival and number of hours already spent
+        groups = {}
+        for ticket in parking.get_open_tickets:
+            group = (week_hour(ticket.arrival.timestamp()), int(max((now - ticket.arrival).total_seconds(), 0) // 3600))
+            groups[group] = groups.get(group, 0) + 1
+        future = self._future_arrivals(week_hour(now.timestamp()))
+        predictions = []
+        for k in range(1, hours + 1):
+            present = sum(count * self._survives(hour, elapsed, k) for (hour, elapsed), count in groups.items())
+            reserved = parking.reserved_spaces(datetime.fromtimestamp(now.timestamp() + k * 3600))
+            predictions.append(present + future[k - 1] + reserved)
+        return predictions
+
+    def time_to_full(self, parking, hours=24, now=None):
+        """ Returns in how many hours the parking lot is expected to be full.
+
+        PRE: Same as `predict`.
+        POST: The first number of hours k (1 <= k <= `hours`) at which the expected occupancy reaches the capacity, or None.
+        """
+        for k, occupancy in enumerate(self.predict(parking, hours, now), 1):
+            if occupancy >= parking.spaces:
+                return k
+        return None
@@ -1,4 +1,10 @@
 from ..my_datetime import *
+from datetime import timedelta
+from ..alert import *
+from ..file_mngt.log_mngt import PLATE_WIDTH
+from .plate_index import *
+from .reservation import *
+from .scheduler import *
 
 # car park rates in euros
 PRICE_PER_HOUR = 2
@@ -6,6 +12,14 @@ PRICE_PER_DAY = 12
 PRICE_PER_MONTH = 100
 # Define the alert threshold (10% of places remaining)
 ALERT_THRESHOLD = 0.1
+# The alert is cleared once more than 15% of places are available again
+ALERT_CLEAR_THRESHOLD = 0.15
+# Minimum number of seconds between two alerts
+ALERT_MIN_INTERVAL = 60
+# Maximum length of a plate in bytes (UTF-8), the size of the plate in the records of the ticket log
+PLATE_MAX_LENGTH = PLATE_WIDTH
+# Width in seconds of the arrival buckets read from the ticket log (15 minutes keeps every time zone offset exact)
+REPORT_BUCKET = 900
 
 
 class ParkingFull(Exception):
@@ -17,13 +31,18 @@ class Parking:
     It stores also the cars that already been in one time.
     """
 
-    def __init__(self, cars_in=None, cars_out=None, spaces=None, num_of_floors=4, spaces_per_floor=48):
+    def __init__(self, cars_in=None, cars_out=None, spaces=None, num_of_floors=4, spaces_per_floor=48, alerts=None, reservations=None, schedule=None, alert_state=None, log=None):
         """Initializes a new Parking object.
 
         PRE:
             - `cars_in` and `cars_out` are lists of Car objects or None (default: empty list).
             - `spaces` is an integer specifying the total number of spaces, or None (default: calculated from `num_of_floors` and `spaces_per_floor`).
             - `num_of_floors` and `spaces_per_floor` are positive integers.
+            - `alerts` is an OccupancyMonitor or None (default: alerts printed in the terminal).
+            - `reservations` is a list of Reservation objects or None (default: empty list), the past ones are dropped.
+            - `schedule` is the SubscriptionScheduler of the cars or None (default: built from the subscriptions of the cars).
+            - `alert_state` is the state of the alerts saved by `state_dict` or None (default: set from the current occupancy).
+            - `log` is the TicketLog the completed stays are appended to by `rmv_car`, or None (default: no log).
         POST: The parking lot is initialized with the specified or default values.
         RAISE: ValueError if `num_of_floors` or `spaces_per_floor` is not positive.
         """
@@ -32,6 +51,81 @@ class Parking:
         self._cars_in = [] if cars_in is None else cars_in
         self._cars_out = [] if cars_out is None else cars_out
         self._spaces = num_of_floors * spaces_per_floor if spaces is None else spaces
+        self._parked = set(map(lambda c: c.plate, self._cars_in))
+        # Only built on the first fuzzy lookup, an exact lookup only needs `_parked`
+        self._plate_index = None
+        # Incremented by every change of the occupancy, for the caches built on the parking lot
+        self._version = 0
+        # Plates of the cars, and other parts of the state ("reservations", "sub_schedule"), changed since the last save (see shard_writer)
+        self._dirty = set()
+        self._dirty_state = set()
+        self._schedule = SubscriptionScheduler.from_cars(self.all_cars) if schedule is None else schedule
+        for car in self.all_cars:
+            car.set_listener(self._sub_changed)
+        self._reservations = {}
+        for reservation in [] if reservations is None else reservations:
+            if reservation.end > datetime.now():
+                self._reservations.setdefault(reservation.plate, []).append(reservation)
+        self._build_timeline()
+        self._log = log
+        # Errors of the stays that could not be appended to the log (the cars are checked out anyway)
+        self._log_errors = []
+        self._alerts = OccupancyMonitor(None, ALERT_THRESHOLD, ALERT_CLEAR_THRESHOLD, ALERT_MIN_INTERVAL) if alerts is None else alerts
+        if alert_state is None:
+            self._alerts.reset(self.av_spaces(), self._spaces)
+        else:
+            self._alerts.load(alert_state)
+
+    @property
+    def alerts(self):
+        return self._alerts
+
+    @property
+    def log_errors(self):
+        return self._log_errors
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def spaces(self):
+        return self._spaces
+
+    @property
+    def dirty(self):
+        """ Return the plates of the cars changed since the last call to `clear_dirty`.
+
+        PRE: None.
+        POST: A set of plates.
+        """
+        return set(self._dirty)
+
+    @property
+    def dirty_state(self):
+        """ Return the parts of the state of `state_dict` changed since the last call to `clear_dirty`.
+
+        PRE: None.
+        POST: A set of keys of `state_dict`.
+        """
+        return set(self._dirty_state)
+
+    def clear_dirty(self, plates=None, parts=None):
+        """ Forgets the changed cars and parts of the state, once they are saved.
+
+        PRE: `plates` and `parts` are the sets of `dirty` and `dirty_state` that are saved, or None (default: all of them).
+        POST: The given plates and parts are removed from `dirty` and `dirty_state`, the ones changed since are kept.
+        """
+        self._dirty -= self._dirty if plates is None else plates
+        self._dirty_state -= self._dirty_state if parts is None else parts
+
+    def get_car(self, plate):
+        """ Returns the Car object of a plate.
+
+        PRE: `plate` is a string.
+        POST: The Car object in `cars_in` or `cars_out`, or None if the plate is unknown.
+        """
+        return next(filter(lambda c: c.plate == plate, self.all_cars), None)
 
     @property
     def all_cars(self):
@@ -54,17 +148,76 @@ class Parking:
             all_tickets += car.tickets
         return all_tickets
 
+    @property
+    def get_open_tickets(self):
+        """ Return the tickets of the cars currently in the parking lot.
+
+        PRE: None.
+        POST: A list of the last Ticket object of every car in `cars_in`.
+        """
+        return list(map(lambda c: c.last_ticket, self._cars_in))
+
+    def archive_tickets(self, before):
+        """ Removes from the hot state every ticket that arrived before `before`, so they can be moved to the archive.
+        The ticket of a car still in the parking lot is never archived.
+
+        PRE: `before` is a datetime object.
+        POST:
+            - The archived tickets are removed from their car, which keeps a count of them.
+            - Returns the list of the removed Ticket objects.
+        """
+        archived = []
+        for car in self._cars_in:
+            archived += self._pop_tickets(car, before, True)
+        for car in self._cars_out:
+            archived += self._pop_tickets(car, before, False)
+        return archived
+
+    def completed_stays(self, archived=()):
+        """ Yields the completed stays of the parking lot, then the archived ones, to fill the ticket log.
+
+        PRE: `archived` is an iterable of archived ticket dictionaries (see `archive_reader`).
+        POST: Yields (plate, amount, arrival, departure) tuples, the timestamps as floats. The departure and the amount
+              of the tickets saved before the departures were recorded are unknown: None and 0.
+        """
+        subs = dict(map(lambda c: (c.plate, c.sub), self.all_cars))
+        parked = set(map(lambda c: c.plate, self._cars_in))
+        for car in self.all_cars:
+            # The last ticket of a car in the parking lot is still open
+            for ticket in car.tickets[:-1] if car.plate in parked else car.tickets:
+                yield self._stay(ticket.to_dict(), car.sub)
+        for data in archived:
+            yield self._stay(data, subs.get(data['plate']))
+
+    @staticmethod
+    def _stay(data, sub):
+        arrival, departure = data['arrival'], data.get('departure')
+        if departure is None:
+            return data['plate'], 0, arrival, None
+        amount = Payment.stay_price(sub, datetime.fromtimestamp(arrival), timedelta(seconds=departure - arrival))
+        return data['plate'], amount, arrival, departure
+
+    def _pop_tickets(self, car, before, keep_last):
+        tickets = car.pop_tickets(before, keep_last)
+        if tickets:
+            self._dirty.add(car.plate)
+        return tickets
+
     @classmethod
-    def from_dict(cls, data):
+    def from_dict(cls, data, log=None):
         """ Transforms a dictionary into a Parking object.
 
-        PRE: data is a dictionary with key-value pairs.
+        PRE: data is a dictionary with key-value pairs, `log` is a TicketLog or None (see `__init__`).
         POST: The parking lot is initialized with the specified or default values.
         """
         return cls(
             list(map(lambda c: Car.from_dict(c), data['cars_in'])),
             list(map(lambda c: Car.from_dict(c), data['cars_out'])),
-            data['spaces']
+            data['spaces'],
+            reservations=list(map(lambda r: Reservation.from_dict(r), data.get('reservations', []))),
+            schedule=SubscriptionScheduler.from_dict(data['sub_schedule']) if 'sub_schedule' in data else None,
+            alert_state=data.get('alert_state'),
+            log=log
         )
 
     def to_dict(self):
@@ -76,57 +229,153 @@ class Parking:
         return {
             'cars_in': list(map(lambda c: c.to_dict(), self._cars_in)),
             'cars_out': list(map(lambda c: c.to_dict(), self._cars_out)),
+            'spaces': self._spaces,
+            **self.state_dict()
+        }
+
+    def to_manifest(self):
+        """ Transforms a Parking object to a small dictionary: the spaces and the plates of `cars_in`.
+
+        PRE: None.
+        POST: A dictionary with the keys "cars_in" (list of plates) and "spaces".
+        """
+        return {
+            'cars_in': list(map(lambda c: c.plate, self._cars_in)),
             'spaces': self._spaces
         }
 
+    def state_dict(self):
+        """ Transforms the reservations, the subscription schedule and the state of the alerts to a dictionary.
+
+        PRE: None.
+        POST: A dictionary with the keys "reservations" (the ones not over yet), "sub_schedule" and "alert_state".
+        """
+        return {
+            'reservations': list(map(lambda r: r.to_dict(), filter(lambda r: r.end > datetime.now(), self.reservations))),
+            'sub_schedule': self._schedule.to_dict(),
+            'alert_state': self._alerts.to_dict()
+        }
+
     def add_car(self, plate):
         """ If the car didn't already exist in `cars_out`, a new Car object is created and the car correspondant to the `plate` is added into `cars_in`.
         A Ticket object is added to the specified car.
-        It also sends an alert when the parking lot is almost full. (10% capacity remains)
+        It also sends an alert when the parking lot becomes almost full. (10% capacity remains)
+
+        A car arriving during its reservation, or up to RESERVATION_HOLD seconds before it, takes the space it booked.
 
         PRE: `plate` is a string referring to a car (not) in the parking lot.
         POST:
             - Adds the Car object to `cars_in`
             - Create a new Ticket object to the car.
-            - Send an alert if it remains less than 10% of the parking lot capacity.
+            - The current or next reservation of the car, if any, is used and removed.
+            - Queues an alert if the remaining capacity just went under 10% of the parking lot capacity.
         RAISE:
-            - ParkingFull if there are no available spaces (av_spaces() returns 0).
-            - ValueError if car already exists in the parking lot.
+            - ParkingFull if every space is taken, or if there are no available spaces (av_spaces() returns 0) and the car has no reservation.
+            - ValueError if car already exists in the parking lot, or if the plate is longer than PLATE_MAX_LENGTH bytes.
         """
-        if self.av_spaces() == 0:
+        self._check_plate(plate)
+        booked = self._booked(plate)
+        if len(self._cars_in) >= self._spaces or (self.av_spaces() == 0 and not booked):
             raise ParkingFull("There are no available spaces in the parking lot.")
-        if plate in list(map(lambda c: c.plate, self._cars_in)):
+        if plate in self._parked:
             raise ValueError(f'Car with plate {plate} already exists.')
-
-        # If the car park is almost full, send an alert
-        if self.av_spaces() / self._spaces <= ALERT_THRESHOLD:
-            self.send_alert()
+        if booked:
+            self.cancel_reservation(booked[0])
 
         if plate in list(map(lambda c: c.plate, self._cars_out)):
             car = list(filter(lambda c: c.plate == plate, self._cars_out))[0]
             self._cars_out.remove(car)
         else:
             car = Car(plate)
+            car.set_listener(self._sub_changed)
 
         car.add_ticket()
         self._cars_in.append(car)
+        self._set_parked(plate, True)
+        self._version += 1
+        self._dirty.add(plate)
+        # Only queued, the sinks are called by the dispatcher thread
+        self._update_alerts()
+
+    @staticmethod
+    def _check_plate(plate):
+        if len(plate.encode('utf-8')) > PLATE_MAX_LENGTH:
+            raise ValueError(f'The plate {plate} is longer than {PLATE_MAX_LENGTH} characters.')
 
-    def rmv_car(self, plate):
+    def rmv_car(self, plate, max_distance=0):
         """ Removes a car from `cars_in` if it exists to add it in `cars_out`.
         It also calculates the amount to be paid by the consumer and return it.
 
-        PRE: The plate of the car that is to be removed.
+        PRE:
+            - The plate of the car that is to be removed.
+            - `max_distance` is the number of misread characters tolerated if the plate isn't in the parking lot (default: exact match).
         POST:
             - Removes the car from `cars_in` and add it to `cars_out`.
+            - Appends the stay to the ticket log of the parking lot, if any (a failure is added to `log_errors`).
             - Returns the amount to be paid by the consumer.
-        RAISE: ValueError if a car with the corresponding plate does not exist in the parking lot.
+        RAISE: ValueError if a car with the corresponding plate (or a single closest one) does not exist in the parking lot.
         """
-        if plate not in list(map(lambda c: c.plate, self._cars_in)):
-            raise ValueError(f"Car with plate {plate} isn't in the parking lot.")
+        plate = self.resolve_plate(plate, max_distance)
         car = list(filter(lambda c: c.plate == plate, self._cars_in))[0]
         self._cars_in.remove(car)
+        self._set_parked(plate, False)
+        self._version += 1
+        self._dirty.add(plate)
         self._cars_out.append(car)
-        return car.last_ticket.parked_time, car.checkout(), car.sub
+        self._update_alerts()
+        amount_due = car.checkout()
+        self._log_stay(car.last_ticket, amount_due)
+        return car.last_ticket.parked_time, amount_due, car.sub
+
+    def _log_stay(self, ticket, amount_due):
+        # The car is already checked out, a failure of the log must not hide it
+        if self._log is None:
+            return
+        try:
+            self._log.append(ticket, amount_due)
+        except (ValueError, OSError) as e:
+            self._log_errors.append(e)
+
+    def _update_alerts(self):
+        if self._alerts.update(self.av_spaces(), self._spaces) is not None:
+            self._dirty_state.add('alert_state')
+
+    def find_plate(self, plate, max_distance=1):
+        """ Returns the plates of the parking lot close to a (possibly misread) plate.
+
+        PRE: `plate` is a string, 0 <= `max_distance` <= PLATE_INDEX_DISTANCE.
+        POST: A list of (distance, plate) tuples of the cars in `cars_in`, the closest first.
+        RAISE: ValueError if `max_distance` is greater than PLATE_INDEX_DISTANCE.
+        """
+        if self._plate_index is None:
+            self._plate_index = PlateIndex(self._parked)
+        return self._plate_index.search(plate, max_distance)
+
+    def _set_parked(self, plate, parked):
+        """ Adds or removes a plate from the plates in the parking lot, and from the plate index if it is built. """
+        if parked:
+            self._parked.add(plate)
+        else:
+            self._parked.discard(plate)
+        if self._plate_index is not None:
+            (self._plate_index.add if parked else self._plate_index.remove)(plate)
+
+    def resolve_plate(self, plate, max_distance=0):
+        """ Returns the plate of the car in the parking lot matching a (possibly misread) plate.
+
+        PRE: `plate` is a string, 0 <= `max_distance` <= PLATE_INDEX_DISTANCE.
+        POST: `plate` if it is in the parking lot, otherwise the only closest plate within `max_distance`.
+        RAISE: ValueError if no car, or several cars at the same distance, match the plate.
+        """
+        if plate in self._parked:
+            return plate
+        candidates = self.find_plate(plate, max_distance) if max_distance > 0 else []
+        if not candidates:
+            raise ValueError(f"Car with plate {plate} isn't in the parking lot.")
+        closest = list(filter(lambda c: c[0] == candidates[0][0], candidates))
+        if len(closest) > 1:
+            raise ValueError(f"Car with plate {plate} isn't in the parking lot, did you mean {' or '.join(map(lambda c: c[1], closest))}?")
+        return closest[0][1]
 
     def new_car(self, plate):
         """ In the case a car needs to be created without being added to `cars_in`.
@@ -135,24 +384,160 @@ class Parking:
         POST: Adds a new Car object to `cars_out` with the specified `plate`.
         """
         new_car = Car(plate)
+        new_car.set_listener(self._sub_changed)
         self._cars_out.append(new_car)
+        self._dirty.add(plate)
         return new_car
 
+    def sweep_subscriptions(self, now=None):
+        """ Pops the subscription events that are due (see SubscriptionScheduler.sweep).
+
+        PRE: `now` is a datetime object or None (default: now).
+        POST: Returns a tuple (expired, renewals, stats), the returned events are removed from the schedule.
+        """
+        self._dirty_state.add('sub_schedule')
+        return self._schedule.sweep(now)
+
+    def _sub_changed(self, car):
+        """ Schedules the events of the subscription of a car each time it is added or extended. """
+        self._schedule.schedule(car.plate, car.sub.end)
+        self._dirty.add(car.plate)
+        self._dirty_state.add('sub_schedule')
+
     def av_spaces(self):
         """ Returns the total number of spaces available in the parking lot.
 
         PRE: None.
-        POST: The number of spaces available.
+        POST: The number of spaces available, without the spaces reserved within the next RESERVATION_HOLD seconds.
         """
-        return self._spaces - len(self._cars_in)
+        return max(0, self._spaces - len(self._cars_in) - self._held_spaces())
+
+    def _held_spaces(self):
+        """ Returns the number of spaces kept for the reservations running within the next RESERVATION_HOLD seconds. """
+        now = self._slot(datetime.now())
+        return self._timeline.max(now, min(now + RESERVATION_HOLD // RESERVATION_SLOT, self._timeline.size))
+
+    def _booked(self, plate):
+        """ Returns the reservations of a car running within the next RESERVATION_HOLD seconds, the first one first. """
+        now = datetime.now()
+        return sorted(filter(lambda r: r.start <= now + timedelta(seconds=RESERVATION_HOLD) and now < r.end, self._reservations.get(plate, [])), key=lambda r: r.start)
+
+    @property
+    def reservations(self):
+        """ Return a list of all the Reservation objects of the parking lot.
+
+        PRE: None.
+        POST: A list of Reservation objects sorted by start.
+        """
+        all_reservations = []
+        for reservations in self._reservations.values():
+            all_reservations += reservations
+        return sorted(all_reservations, key=lambda r: r.start)
+
+    def can_reserve(self, start, end):
+        """ Check if a space can be reserved between two dates.
+
+        PRE: `start` and `end` are datetime objects, `start` < `end`.
+        POST: True if, for the whole period, a space is left after the other reservations
+              (and the cars currently in the parking lot, within the next RESERVATION_HOLD seconds).
+        RAISE: ValueError if the period is over, or ends more than RESERVATION_HORIZON_DAYS days ahead.
+        """
+        return self._can_reserve(start, end, len(self._cars_in))
+
+    def _can_reserve(self, start, end, occupied):
+        lo, hi = self._slots(start, end)
+        peak = self._timeline.max(lo, hi)
+        now = self._slot(datetime.now())
+        hold = min(now + RESERVATION_HOLD // RESERVATION_SLOT, self._timeline.size)
+        if lo < hold:
+            # The cars in the parking lot are expected to still be there during the hold
+            peak = max(peak, self._timeline.max(max(lo, now), min(hi, hold)) + occupied)
+        return peak < self._spaces
+
+    def reserve(self, plate, start, end):
+        """ Reserves a space for a car between two dates.
+
+        PRE:
+            - `plate` is a string.
+            - `start` and `end` are datetime objects, `start` < `end`.
+        POST: Returns the new Reservation object, its space is deduced from the available spaces during the period.
+        RAISE:
+            - ParkingFull if no space is left during the period (see can_reserve).
+            - ValueError if the car already has a reservation overlapping the period, or if the period is invalid.
+        """
+        reservation = Reservation(plate, start, end)
+        if list(filter(lambda r: r.start < end and start < r.end, self._reservations.get(plate, []))):
+            raise ValueError(f'Car with plate {plate} already has a reservation during this period.')
+        if not self.can_reserve(start, end):
+            raise ParkingFull("There are no spaces left to reserve during this period.")
+        self._reservations.setdefault(plate, []).append(reservation)
+        self._timeline.add(*self._slots(start, end), 1)
+        self._version += 1
+        self._dirty_state.add('reservations')
+        return reservation
+
+    def cancel_reservation(self, reservation):
+        """ Cancels a reservation.
+
+        PRE: `reservation` is a Reservation object of the parking lot.
+        POST: The reserved space is available again.
+        RAISE: ValueError if the reservation isn't in the parking lot.
+        """
+        reservations = self._reservations.get(reservation.plate, [])
+        if reservation not in reservations:
+            raise ValueError(f'There is no such reservation for the car with plate {reservation.plate}.')
+        reservations.remove(reservation)
+        if not reservations:
+            del self._reservations[reservation.plate]
+        if reservation.end > datetime.now():
+            self._timeline.add(*self._slots(max(reservation.start, datetime.now()), reservation.end, check=False), -1)
+        self._version += 1
+        self._dirty_state.add('reservations')
+
+    def reserved_spaces(self, at=None):
+        """ Returns the number of spaces reserved at a given time.
+
+        PRE: `at` is a datetime object or None (default: now).
+        POST: The number of reservations covering `at` (0 if `at` is out of the timeline).
+        """
+        slot = self._slot(datetime.now() if at is None else at)
+        return self._timeline.max(slot, slot + 1) if 0 <= slot < self._timeline.size else 0
+
+    def _build_timeline(self):
+        """ Rebuilds the timeline of the reservations, starting from the current slot. """
+        self._origin = datetime.now().timestamp() // RESERVATION_SLOT * RESERVATION_SLOT
+        self._timeline = SegmentTree(RESERVATION_HORIZON_DAYS * 24 * 3600 // RESERVATION_SLOT * 2)
+        for reservation in self.reservations:
+            if reservation.end > datetime.now():
+                self._timeline.add(*self._slots(max(reservation.start, datetime.now()), reservation.end, check=False), 1)
+
+    def _slot(self, date):
+        """ Returns the index of the slot of the timeline containing `date`. """
+        slot = int((date.timestamp() - self._origin) // RESERVATION_SLOT)
+        if slot >= self._timeline.size // 2:
+            # The timeline is twice the horizon long, it is moved forward once half of it is in the past
+            self._build_timeline()
+            slot = int((date.timestamp() - self._origin) // RESERVATION_SLOT)
+        return slot
+
+    def _slots(self, start, end, check=True):
+        """ Returns the range [lo, hi[ of the slots of the timeline overlapped by the period between `start` and `end`. """
+        if check and end <= datetime.now():
+            raise ValueError('This period is already over.')
+        if check and end > datetime.now() + timedelta(days=RESERVATION_HORIZON_DAYS):
+            raise ValueError(f'Reservations are only possible up to {RESERVATION_HORIZON_DAYS} days ahead.')
+        self._slot(datetime.now())
+        lo = max(0, int((start.timestamp() - self._origin) // RESERVATION_SLOT))
+        hi = -int((self._origin - end.timestamp()) // RESERVATION_SLOT)
+        return lo, min(max(hi, lo + 1), self._timeline.size)
 
     def send_alert(self):
-        """ Send an alert when the parking lot is almost full.
+        """ Send an alert when the parking lot is almost full, whatever the state of the monitor.
 
         PRE: None.
-        POST: Print a message in the terminal.
+        POST: An alert is queued to the sinks of the monitor.
         """
-        print(f"Alert: The car park is almost full! There are only {self.av_spaces()} spaces available.")
+        self._alerts.dispatcher.put(Alert('alert', self.av_spaces(), self._spaces))
 
     def __str__(self):
         """ Returns a string representation of the Parking object.
@@ -164,12 +549,13 @@ class Parking:
 
 
 class Ticket:
-    def __init__(self, plate, arrival=None):
+    def __init__(self, plate, arrival=None, departure=None):
         """ Initializes a new Ticket object.
 
             PRE:
                 -The plate of the car (must be a non-empty string).
                 -`arrival` must be a datetime object.
+                -`departure` is a datetime object or None while the car is still in the parking lot.
             POST: A Ticket object is initialized with the specified or default values.
             RAISE:
                 -ValueError if the plate is not a non-empty string.
@@ -177,14 +563,31 @@ class Ticket:
         """
         self._plate = plate
         self._arrival = datetime.now() if arrival is None else arrival
+        self._departure = departure
+
+    @property
+    def plate(self):
+        return self._plate
 
     @property
     def arrival(self):
         return self._arrival
 
+    @property
+    def departure(self):
+        return self._departure
+
     @property
     def parked_time(self):
-        return datetime.now() - self._arrival
+        return (datetime.now() if self._departure is None else self._departure) - self._arrival
+
+    def close(self):
+        """ Records the departure of the car.
+
+            PRE: None.
+            POST: The departure of the ticket is set to the current time.
+        """
+        self._departure = datetime.now()
 
     @classmethod
     def from_dict(cls, data):
@@ -195,7 +598,8 @@ class Ticket:
         """
         return cls(
             data['plate'],
-            datetime.fromtimestamp(data['arrival'])
+            datetime.fromtimestamp(data['arrival']),
+            None if data.get('departure') is None else datetime.fromtimestamp(data['departure'])
         )
 
     def to_dict(self):
@@ -206,7 +610,8 @@ class Ticket:
         """
         return {
             "plate": self._plate,
-            "arrival": self._arrival.timestamp()
+            "arrival": self._arrival.timestamp(),
+            "departure": None if self._departure is None else self._departure.timestamp()
         }
 
     def __str__(self):
@@ -220,13 +625,14 @@ class Ticket:
 
 
 class Car:
-    def __init__(self, plate, tickets=None, sub=None):
+    def __init__(self, plate, tickets=None, sub=None, archived=0):
         """Initializes a new Car object.
 
                PRE:
                    - The plate of the car (must be a non-empty string).
                    - A list of Ticket objects associated with the car or None (default: empty list).
                    - The subscription associated with the car (default None).
+                   - The number of tickets of the car already moved to the archive (default 0).
                POST: A Car object is initialized with the specified or default values.
                RAISE:
                    - TypeError if plate is not a string or tickets is not a list.
@@ -235,6 +641,8 @@ class Car:
         self._plate = plate
         self._tickets = [] if tickets is None else tickets
         self._sub = sub
+        self._archived = archived
+        self._listener = None
 
     @property
     def plate(self):
@@ -252,6 +660,10 @@ class Car:
     def tickets(self):
         return self._tickets
 
+    @property
+    def archived(self):
+        return self._archived
+
     @classmethod
     def from_dict(cls, data):
         """ Transforms a dictionary into a Car object.
@@ -262,7 +674,8 @@ class Car:
         return cls(
             data['plate'],
             list(map(lambda t: Ticket.from_dict(t), data['tickets'])),
-            None if data['sub'] is None else Subscription.from_dict(data['sub'])
+            None if data['sub'] is None else Subscription.from_dict(data['sub']),
+            data.get('archived', 0)
         )
 
     def to_dict(self):
@@ -274,7 +687,8 @@ class Car:
         return {
             "plate": self._plate,
             "tickets": list(map(lambda t: t.to_dict(), self._tickets)),
-            "sub": None if self._sub is None else self._sub.to_dict()
+            "sub": None if self._sub is None else self._sub.to_dict(),
+            "archived": self._archived
         }
 
     def add_ticket(self):
@@ -285,6 +699,36 @@ class Car:
         """
         self._tickets.append(Ticket(self._plate))
 
+    def pop_tickets(self, before, keep_last=False):
+        """ Removes the tickets that arrived before the specified date.
+
+            PRE:
+                -`before` is a datetime object.
+                -`keep_last` is True if the last ticket must stay with the car (the car is still in the parking lot).
+            POST:
+                -The removed tickets are counted in `archived`.
+                -Returns the list of the removed Ticket objects.
+        """
+        last = self._tickets[-1:] if keep_last else []
+        candidates = self._tickets[:-1] if keep_last else self._tickets
+        old = list(filter(lambda t: t.arrival < before, candidates))
+        if old:
+            self._tickets = list(filter(lambda t: t.arrival >= before, candidates)) + last
+            self._archived += len(old)
+        return old
+
+    def set_listener(self, listener):
+        """ Registers the function called each time the subscription of the car is added or extended.
+
+            PRE: `listener` is a function taking the Car object, or None.
+            POST: The listener replaces the previous one.
+        """
+        self._listener = listener
+
+    def _notify(self):
+        if self._listener is not None:
+            self._listener(self)
+
     def add_sub(self, length):  # in months
         """ Adds a subscription to the car object.
 
@@ -299,6 +743,7 @@ class Car:
         """
         if self._sub is None or not self._sub.is_active():
             self._sub = Subscription(self._plate, length)
+            self._notify()
             return Payment(self).sub_price(length)
         else:
             raise ValueError(f'This car already has a subscription that ends on {self._sub.end.strftime('%d/%m/%Y')}.')
@@ -313,9 +758,11 @@ class Car:
                 -Extends the car's subscription to the specified length.
         """
         self._sub.extend(length)
+        self._notify()
         return Payment(self).sub_price(length)
 
     def checkout(self):
+        self.last_ticket.close()
         return Payment(self).amount_due()
 
     def __str__(self):
@@ -424,11 +871,14 @@ class Payment:
 
     def amount_due(self):
         ticket = self._car.last_ticket
-        sub = self._car.sub
-        if sub is not None and sub.was_active(ticket.arrival):
+        return self.stay_price(self._car.sub, ticket.arrival, ticket.parked_time)
+
+    @staticmethod
+    def stay_price(sub, arrival, parked_time):
+        if sub is not None and sub.was_active(arrival):
             return 0
-        hours = int(ticket.parked_time.seconds / 3600)
-        days = ticket.parked_time.days
+        hours = int(parked_time.seconds / 3600)
+        days = parked_time.days
         switch_tariff = int(PRICE_PER_DAY / PRICE_PER_HOUR)
         if hours > switch_tariff:
             hours -= switch_tariff
@@ -446,22 +896,56 @@ class Report:
         self._parking = parking
         self._vehicle_count_per_day = {}
         self._peak_hours = {}
+        self._revenue = None
+
+    def add_data(self, archived=()):
+        """ Records the arrival of every ticket of the parking lot.
 
-    def add_data(self):
+        PRE: `archived` is an iterable of archived ticket dictionaries (see `archive_reader`), read one by one.
+        POST: The arrivals of the hot tickets and of the archived ones are recorded.
+        """
         tickets = self._parking.get_all_tickets
         for ticket in tickets:
             self.record_vehicle(ticket.arrival)
+        for data in archived:
+            self.record_vehicle(datetime.fromtimestamp(data['arrival']))
+
+    def add_log(self, log):
+        """ Records the arrivals from a mapped ticket log instead of the Ticket objects of the parking lot.
+
+        PRE: `log` is an opened TicketLog holding the completed stays.
+        POST:
+            - The arrivals of the logged stays and of the cars still in the parking lot are recorded.
+            - The revenue of the logged stays is added to the report.
+        """
+        # The arrivals are counted per quarter of an hour on the mapped file,
+        # only one datetime is then built per quarter instead of one per ticket
+        for bucket, count in log.arrival_buckets(REPORT_BUCKET).items():
+            self.record_vehicle(datetime.fromtimestamp(bucket * REPORT_BUCKET), count)
+        for ticket in self._parking.get_open_tickets:
+            self.record_vehicle(ticket.arrival)
+        self._revenue = log.revenue()
+
+    def forecast(self, forecast, hours=24):
+        """ Predicts the occupancy of the parking lot for the next hours.
 
-    def record_vehicle(self, arrival_time:datetime):
+        PRE: `forecast` is a Forecast object updated from the ticket log, 1 <= `hours` <= FORECAST_MAX_HOURS.
+        POST: Returns a tuple (occupancy, time_to_full):
+            - `occupancy` is the list of the expected occupied spaces for each of the next `hours` hours.
+            - `time_to_full` is the number of hours before the parking lot is expected to be full, or None.
+        """
+        return forecast.predict(self._parking, hours), forecast.time_to_full(self._parking, hours)
+
+    def record_vehicle(self, arrival_time:datetime, count=1):
         date = arrival_time.date()
         if date not in self._vehicle_count_per_day:
             self._vehicle_count_per_day[date] = 0
-        self._vehicle_count_per_day[date] += 1
+        self._vehicle_count_per_day[date] += count
 
         hour = arrival_time.hour
         if hour not in self._peak_hours:
             self._peak_hours[hour] = 0
-        self._peak_hours[hour] += 1
+        self._peak_hours[hour] += count
 
     def get_daily_report(self):
         return self._vehicle_count_per_day , self._peak_hours
@@ -486,4 +970,6 @@ class Report:
         peak_hours = map(lambda h: f"{h}h", peak_hours)
         peak_hours = "\n".join(peak_hours)
 
-        return f"The busiest days for the parking lot are (with {max_day} cars):\n{peak_days}\nThe peak hours of the parking lot are (with {max_hour} cars):\n{peak_hours}"
+        revenue = "" if self._revenue is None else f"\nThe revenue of the completed stays is €{self._revenue}."
+
+        return f"The busiest days for the parking lot are (with {max_day} cars):\n{peak_days}\nThe peak hours of the parking lot are (with {max_hour} cars):\n{peak_hours}{revenue}"
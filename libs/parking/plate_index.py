@@ -0,0 +1,124 @@
+from itertools import combinations
+
+# Maximum edit distance the index can answer (an ANPR misread is usually 1 or 2 characters)
+PLATE_INDEX_DISTANCE = 2
+
+
+def edit_distance(a, b, max_distance):
+    """ Returns the Levenshtein distance between two strings, stopping early once it exceeds `max_distance`.
+
+    PRE: `a` and `b` are strings, `max_distance` is a positive integer.
+    POST: The edit distance, or `max_distance + 1` if it is greater than `max_distance`.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if len(a) == len(b):
+        # Between strings of the same length, up to 2 substitutions can't be done with fewer edits
+        substitutions = sum(map(lambda chars: chars[0] != chars[1], zip(a, b)))
+        if substitutions <= 2:
+            return min(substitutions, max_distance + 1)
+    # Only the cells at most `max_distance` away from the diagonal can stay under `max_distance`
+    too_far = max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [too_far] * len(b)
+        row_min = i
+        for j in range(max(1, i - max_distance), min(len(b), i + max_distance) + 1):
+            value = previous[j - 1] + (char_a != b[j - 1])
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return too_far
+        previous = current
+    return min(previous[-1], too_far)
+
+
+def deletions(plate, distance):
+    """ Returns every string obtained by deleting up to `distance` characters of `plate` (the plate included).
+
+    PRE: `plate` is a string, `distance` is a positive integer.
+    POST: A set of strings.
+    """
+    variants = {plate}
+    for n in range(1, min(distance, len(plate)) + 1):
+        for removed in combinations(range(len(plate)), n):
+            variants.add(''.join(char for i, char in enumerate(plate) if i not in removed))
+    return variants
+
+
+class PlateIndex:
+    """ Approximate-match index of plates, tolerant to the misreads of the cameras.
+
+    Every plate is indexed under all its variants with up to `max_distance` deleted characters:
+    two plates within this edit distance always share such a variant, so a lookup only costs
+    a few dictionary accesses and the edit distance of the few plates found.
+    """
+
+    def __init__(self, plates=(), max_distance=PLATE_INDEX_DISTANCE):
+        """ Initializes a new PlateIndex object.
+
+        PRE:
+            - `plates` is an iterable of strings.
+            - `max_distance` is the largest edit distance the index will be asked for.
+        POST: The index contains the specified plates.
+        """
+        self._max_distance = max_distance
+        self._variants = {}
+        for plate in plates:
+            self.add(plate)
+
+    def add(self, plate):
+        """ Adds a plate to the index.
+
+        PRE: `plate` is a string.
+        POST: The plate can be found by `search`.
+        """
+        for variant in deletions(plate, self._max_distance):
+            plates = self._variants.get(variant)
+            # A single plate is stored as is, a set is only built for the shared variants
+            if plates is None:
+                self._variants[variant] = plate
+            elif isinstance(plates, str):
+                if plates != plate:
+                    self._variants[variant] = {plates, plate}
+            else:
+                plates.add(plate)
+
+    def remove(self, plate):
+        """ Removes a plate from the index.
+
+        PRE: `plate` is a string.
+        POST: The plate is no longer found by `search` (nothing happens if it was not indexed).
+        """
+        for variant in deletions(plate, self._max_distance):
+            plates = self._variants.get(variant)
+            if plates == plate:
+                del self._variants[variant]
+            elif isinstance(plates, set):
+                plates.discard(plate)
+                if len(plates) == 1:
+                    self._variants[variant] = plates.pop()
+
+    def search(self, plate, max_distance=1):
+        """ Returns the indexed plates within `max_distance` edits of `plate`, the closest first.
+
+        PRE: `plate` is a string, 0 <= `max_distance` <= the distance of the index.
+        POST: A list of (distance, plate) tuples sorted by distance then plate.
+        RAISE: ValueError if `max_distance` is greater than the distance of the index.
+        """
+        if max_distance > self._max_distance:
+            raise ValueError(f'The index only supports distances up to {self._max_distance}.')
+        candidates = set()
+        for variant in deletions(plate, max_distance):
+            plates = self._variants.get(variant)
+            if isinstance(plates, str):
+                candidates.add(plates)
+            elif plates is not None:
+                candidates.update(plates)
+        found = map(lambda c: (edit_distance(plate, c, max_distance), c), candidates)
+        return sorted(filter(lambda f: f[0] <= max_distance, found))
@@ -0,0 +1,134 @@
+from datetime import datetime
+
+# The timeline of the reservations is cut in slots of 15 minutes
+RESERVATION_SLOT = 15 * 60
+# Reservations are possible up to 90 days ahead
+RESERVATION_HORIZON_DAYS = 90
+# The spaces reserved in the next hour are kept for their cars: walk-in cars can't take them,
+# and a car arriving up to an hour before its reservation uses it
+RESERVATION_HOLD = 3600
+
+
+class SegmentTree:
+    """ Array of integers supporting "add a value on a range" and "maximum on a range" in O(log n). """
+
+    def __init__(self, size):
+        """ Initializes a new SegmentTree object.
+
+        PRE: `size` is a positive integer.
+        POST: A tree of `size` values, all equal to 0.
+        """
+        self._size = size
+        self._max = [0] * (4 * size)
+        self._lazy = [0] * (4 * size)
+
+    @property
+    def size(self):
+        return self._size
+
+    def add(self, lo, hi, value):
+        """ Adds `value` to every position of [lo, hi[.
+
+        PRE: 0 <= `lo` <= `hi` <= size.
+        POST: The values of the range are increased by `value`.
+        """
+        if lo < hi:
+            self._add(1, 0, self._size, lo, hi, value)
+
+    def max(self, lo, hi):
+        """ Returns the maximum value on [lo, hi[.
+
+        PRE: 0 <= `lo` < `hi` <= size.
+        POST: The maximum of the values of the range.
+        """
+        return self._query(1, 0, self._size, lo, hi)
+
+    def _add(self, node, node_lo, node_hi, lo, hi, value):
+        if hi <= node_lo or node_hi <= lo:
+            return
+        if lo <= node_lo and node_hi <= hi:
+            self._max[node] += value
+            self._lazy[node] += value
+            return
+        middle = (node_lo + node_hi) // 2
+        self._add(2 * node, node_lo, middle, lo, hi, value)
+        self._add(2 * node + 1, middle, node_hi, lo, hi, value)
+        self._max[node] = max(self._max[2 * node], self._max[2 * node + 1]) + self._lazy[node]
+
+    def _query(self, node, node_lo, node_hi, lo, hi):
+        if lo <= node_lo and node_hi <= hi:
+            return self._max[node]
+        middle = (node_lo + node_hi) // 2
+        # The pending additions of a node apply to its whole range, they are added on the way up
+        if hi <= middle:
+            best = self._query(2 * node, node_lo, middle, lo, hi)
+        elif middle <= lo:
+            best = self._query(2 * node + 1, middle, node_hi, lo, hi)
+        else:
+            best = max(self._query(2 * node, node_lo, middle, lo, hi),
+                       self._query(2 * node + 1, middle, node_hi, lo, hi))
+        return best + self._lazy[node]
+
+
+class Reservation:
+    """ A space booked for a car between two dates. """
+
+    def __init__(self, plate, start, end):
+        """ Initializes a new Reservation object.
+
+        PRE:
+            - The plate of the car (must be a non-empty string).
+            - `start` and `end` are datetime objects.
+        POST: A Reservation object is initialized with the specified values.
+        RAISE: ValueError if `end` is not after `start`.
+        """
+        if end <= start:
+            raise ValueError('The end of a reservation must be after its start.')
+        self._plate = plate
+        self._start = start
+        self._end = end
+
+    @property
+    def plate(self):
+        return self._plate
+
+    @property
+    def start(self):
+        return self._start
+
+    @property
+    def end(self):
+        return self._end
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Transforms a dictionary into a Reservation object.
+
+        PRE: data is a dictionary with key-value pairs.
+        POST: The Reservation object is initialized with the specified values.
+        """
+        return cls(
+            data['plate'],
+            datetime.fromtimestamp(data['start']),
+            datetime.fromtimestamp(data['end'])
+        )
+
+    def to_dict(self):
+        """ Transforms a Reservation object to a dictionary.
+
+        PRE: None.
+        POST: The dictionary representation of the Reservation object.
+        """
+        return {
+            "plate": self._plate,
+            "start": self._start.timestamp(),
+            "end": self._end.timestamp()
+        }
+
+    def __str__(self):
+        """ Returns a string representation of the Reservation object.
+
+        PRE: None.
+        POST: The string representation of the Reservation object.
+        """
+        return f"Plate : {self._plate}\nStart : {self._start.strftime('%d/%m/%Y à %H:%M')}\nEnd : {self._end.strftime('%d/%m/%Y à %H:%M')}"
@@ -0,0 +1,105 @@
+import heapq
+from datetime import datetime, timedelta
+
+# Number of days before the end of a subscription when its renewal reminder is due
+RENEWAL_NOTICE_DAYS = 7
+
+
+class SubscriptionScheduler:
+    """ Min-heap of the upcoming events of the subscriptions: renewal reminders and expiries.
+
+    Each entry is (due timestamp, kind, plate, end timestamp). When a subscription is extended,
+    new entries are pushed and the old ones become stale: they are skipped when popped,
+    as their end no longer matches the last scheduled end of the plate.
+    """
+
+    def __init__(self, entries=None):
+        """ Initializes a new SubscriptionScheduler object.
+
+        PRE: `entries` is a list of [due, kind, plate, end] lists or None (default: empty heap).
+        POST: The scheduler contains the specified entries.
+        """
+        self._heap = [] if entries is None else list(map(tuple, entries))
+        heapq.heapify(self._heap)
+        # The subscriptions only get longer, the latest end of a plate is the current one
+        self._ends = {}
+        for _, _, plate, end in self._heap:
+            self._ends[plate] = max(end, self._ends.get(plate, end))
+
+    def __len__(self):
+        return len(self._heap)
+
+    @classmethod
+    def from_cars(cls, cars):
+        """ Builds the scheduler of the subscriptions of a list of cars in O(n).
+
+        PRE: `cars` is an iterable of Car objects.
+        POST: The events of every subscription not yet expired are scheduled.
+        """
+        scheduler = cls()
+        now = datetime.now()
+        for car in cars:
+            if car.sub is not None and car.sub.end > now:
+                scheduler._ends[car.plate] = car.sub.end.timestamp()
+                scheduler._heap += scheduler._entries(car.plate, car.sub.end)
+        heapq.heapify(scheduler._heap)
+        return scheduler
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Transforms a list of entries into a SubscriptionScheduler object.
+
+        PRE: data is a list of [due, kind, plate, end] lists.
+        POST: The SubscriptionScheduler object is initialized with the specified entries.
+        """
+        return cls(data)
+
+    def to_dict(self):
+        """ Transforms a SubscriptionScheduler object to a list of entries, in heap order.
+
+        PRE: None.
+        POST: A list of [due, kind, plate, end] lists.
+        """
+        return list(map(list, self._heap))
+
+    @staticmethod
+    def _entries(plate, end):
+        end_ts = end.timestamp()
+        return [
+            ((end - timedelta(days=RENEWAL_NOTICE_DAYS)).timestamp(), 'renew', plate, end_ts),
+            (end_ts, 'expire', plate, end_ts)
+        ]
+
+    def schedule(self, plate, end):
+        """ Schedules the renewal reminder and the expiry of a subscription, replacing the previous ones of the plate.
+
+        PRE: `plate` is a string, `end` is the datetime at which the subscription ends.
+        POST: Two entries are pushed in O(log n).
+        """
+        self._ends[plate] = end.timestamp()
+        for entry in self._entries(plate, end):
+            heapq.heappush(self._heap, entry)
+
+    def sweep(self, now=None):
+        """ Pops the events that are due, in O(k log n) for k events.
+
+        PRE: `now` is a datetime object or None (default: now).
+        POST: Returns a tuple (expired, renewals, stats):
+            - `expired` is a list of (plate, end) of the subscriptions that ended since the last sweep.
+            - `renewals` is a list of (plate, end) of the subscriptions ending within RENEWAL_NOTICE_DAYS days.
+            - `stats` is a dictionary counting the expired, renewals, stale (skipped) and still scheduled entries.
+        """
+        now = (datetime.now() if now is None else now).timestamp()
+        expired, renewals, stale = [], [], 0
+        while self._heap and self._heap[0][0] <= now:
+            _, kind, plate, end = heapq.heappop(self._heap)
+            if self._ends.get(plate) != end:
+                stale += 1
+            elif kind == 'expire':
+                expired.append((plate, datetime.fromtimestamp(end)))
+                del self._ends[plate]
+            elif end > now:
+                # A reminder found after the end of its subscription is only reported as expired
+                renewals.append((plate, datetime.fromtimestamp(end)))
+        stats = {'expired': len(expired), 'renewals': len(renewals), 'stale': stale, 'scheduled': len(self._heap)}
+        return expired, renewals, stats
@@ -0,0 +1,220 @@
+import threading
+from .parking import *
+
+# Number of locks shared by the plates (two plates with the same lock wait for each other)
+LOCK_STRIPES = 64
+
+
+class ThreadSafeParking(Parking):
+    """ Parking that can be used by several threads at the same time (e.g. a web or kiosk server).
+
+    Each plate is protected by one of LOCK_STRIPES locks, so the cars of different plates enter
+    and leave in parallel. The occupied spaces are counted by a single counter taken atomically
+    before a car enters, so `av_spaces` is always exact. The shared structures (cars, plate index,
+    reservations, subscription schedule) are only locked for the few instructions updating them.
+    Lock order: plate, then capacity, then shared structures.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """ Initializes a new ThreadSafeParking object, with the same parameters as Parking. """
+        self._stripes = [threading.RLock() for _ in range(LOCK_STRIPES)]
+        self._capacity = threading.Lock()
+        self._shared = threading.RLock()
+        super().__init__(*args, **kwargs)
+
+    # The cars are stored by plate so that a car is moved in O(1),
+    # `cars_in` and `cars_out` are still read as lists by the methods of Parking
+    @property
+    def _cars_in(self):
+        return list(self._in.values())
+
+    @_cars_in.setter
+    def _cars_in(self, cars):
+        self._in = {car.plate: car for car in cars}
+        self._occupied = len(self._in)
+
+    @property
+    def _cars_out(self):
+        return list(self._out.values())
+
+    @_cars_out.setter
+    def _cars_out(self, cars):
+        self._out = {car.plate: car for car in cars}
+
+    def _stripe(self, plate):
+        return self._stripes[hash(plate) % LOCK_STRIPES]
+
+    def av_spaces(self):
+        """ Returns the total number of spaces available in the parking lot.
+
+        PRE: None.
+        POST: The number of spaces available, without the spaces reserved right now.
+        """
+        with self._shared:
+            reserved = self._held_spaces()
+        return max(0, self._spaces - self._occupied - reserved)
+
+    def add_car(self, plate):
+        """ Same as Parking.add_car, the car takes its space atomically. """
+        self._check_plate(plate)
+        with self._stripe(plate):
+            if plate in self._in:
+                raise ValueError(f'Car with plate {plate} already exists.')
+            with self._shared:
+                booked = self._booked(plate)
+            with self._capacity:
+                if self._occupied >= self._spaces or (self.av_spaces() == 0 and not booked):
+                    raise ParkingFull("There are no available spaces in the parking lot.")
+                self._occupied += 1
+
+            try:
+                # The car moves from `cars_out` to `cars_in` in one step, a snapshot always sees it
+                with self._shared:
+                    if booked:
+                        self.cancel_reservation(booked[0])
+                    car = self._out.get(plate)
+                    if car is None:
+                        car = Car(plate)
+                        car.set_listener(self._sub_changed)
+                    car.add_ticket()
+                    self._in[plate] = car
+                    self._out.pop(plate, None)
+                    self._set_parked(plate, True)
+                    self._version += 1
+                    self._dirty.add(plate)
+            except Exception:
+                with self._capacity:
+                    self._occupied -= 1
+                raise
+            self._update_alerts()
+
+    def rmv_car(self, plate, max_distance=0):
+        """ Same as Parking.rmv_car, the space is given back atomically. """
+        with self._shared:
+            plate = self.resolve_plate(plate, max_distance)
+        with self._stripe(plate):
+            with self._shared:
+                car = self._in.pop(plate, None)
+                if car is None:
+                    # Another thread removed it since the plate was resolved
+                    raise ValueError(f"Car with plate {plate} isn't in the parking lot.")
+                self._out[plate] = car
+                self._set_parked(plate, False)
+                self._version += 1
+                self._dirty.add(plate)
+                amount_due = car.checkout()
+            with self._capacity:
+                self._occupied -= 1
+            self._update_alerts()
+            # Outside of the shared lock: each record is written by a single append of a few bytes
+            self._log_stay(car.last_ticket, amount_due)
+            return car.last_ticket.parked_time, amount_due, car.sub
+
+    def new_car(self, plate):
+        """ Same as Parking.new_car. """
+        with self._stripe(plate):
+            new_car = Car(plate)
+            new_car.set_listener(self._sub_changed)
+            with self._shared:
+                self._out[plate] = new_car
+                self._dirty.add(plate)
+            return new_car
+
+    def get_car(self, plate):
+        """ Returns the Car object of a plate.
+
+        PRE: `plate` is a string.
+        POST: The Car object in `cars_in` or `cars_out`, or None if the plate is unknown.
+        """
+        with self._shared:
+            return self._in.get(plate, self._out.get(plate))
+
+    def add_sub(self, plate, length):
+        """ Adds a subscription to a car (created if unknown), checked and set under the lock of the plate.
+
+        PRE: `plate` is a string, `length` is a number of months.
+        POST: Returns the price of the subscription.
+        RAISE: ValueError if the car already has an active subscription.
+        """
+        with self._stripe(plate):
+            car = self.get_car(plate)
+            return (self.new_car(plate) if car is None else car).add_sub(length)
+
+    def extend_sub(self, plate, length):
+        """ Extends the subscription of a car under the lock of its plate.
+
+        PRE: `plate` is the plate of a car with a subscription, `length` is a number of months.
+        POST: Returns the price of the extension.
+        """
+        with self._stripe(plate):
+            return self.get_car(plate).extend_sub(length)
+
+    def find_plate(self, plate, max_distance=1):
+        with self._shared:
+            return super().find_plate(plate, max_distance)
+
+    @property
+    def reservations(self):
+        with self._shared:
+            return super().reservations
+
+    def can_reserve(self, start, end):
+        """ Same as Parking.can_reserve, counting the cars that are entering. """
+        with self._shared:
+            return self._can_reserve(start, end, self._occupied)
+
+    def reserve(self, plate, start, end):
+        with self._stripe(plate), self._capacity, self._shared:
+            return super().reserve(plate, start, end)
+
+    def cancel_reservation(self, reservation):
+        with self._shared:
+            super().cancel_reservation(reservation)
+
+    def reserved_spaces(self, at=None):
+        with self._shared:
+            return super().reserved_spaces(at)
+
+    def sweep_subscriptions(self, now=None):
+        with self._shared:
+            return super().sweep_subscriptions(now)
+
+    def to_dict(self):
+        with self._shared:
+            return super().to_dict()
+
+    def to_manifest(self):
+        with self._shared:
+            return super().to_manifest()
+
+    def state_dict(self):
+        with self._shared:
+            return super().state_dict()
+
+    @property
+    def dirty(self):
+        with self._shared:
+            return set(self._dirty)
+
+    @property
+    def dirty_state(self):
+        with self._shared:
+            return set(self._dirty_state)
+
+    def clear_dirty(self, plates=None, parts=None):
+        with self._shared:
+            super().clear_dirty(plates, parts)
+
+    def archive_tickets(self, before):
+        with self._shared:
+            return super().archive_tickets(before)
+
+    def _sub_changed(self, car):
+        with self._shared:
+            super()._sub_changed(car)
+
+    def _update_alerts(self):
+        av_spaces = self.av_spaces()
+        with self._shared:
+            if self._alerts.update(av_spaces, self._spaces) is not None:
+                self._dirty_state.add('alert_state')
@@ -1,6 +1,8 @@
 from libs.file_mngt import *
 from libs.parking import *
+from datetime import timedelta
 import argparse
+import os
 
 
 def my_input(query, choices=None, numeric=False, my_min=None, my_max=None):
@@ -38,10 +40,17 @@ def my_input(query, choices=None, numeric=False, my_min=None, my_max=None):
 
 
 def main(my_args):
-    if json_reader():
-        parkease = Parking().from_dict(json_reader())
+    # Once migrated with --shards, the cars are saved in shards instead of data/data.json
+    sharded = my_args.shards or os.path.exists(os.path.join(SHARD_DIR, MANIFEST))
+    # A gate event (exact plate) or -s only reads the manifest and the shard of the plate
+    gate_only = set(filter(lambda k: vars(my_args)[k], vars(my_args))) <= {'management', 'spaces'}
+    if os.path.exists(os.path.join(SHARD_DIR, MANIFEST)):
+        plates = ([my_args.management[1]] if my_args.management else []) if gate_only else None
+        parkease = Parking.from_dict(shard_reader(plates=plates), TicketLog())
+    elif json_reader():
+        parkease = Parking.from_dict(json_reader(), TicketLog())
     else:
-        parkease = Parking()
+        parkease = Parking(log=TicketLog())
 
     if my_args.management:
         state, plate = my_args.management
@@ -50,9 +59,15 @@ def main(my_args):
                 parkease.add_car(plate)
                 print(f"Car with plate {plate} added.")
             else:
+                if my_args.fuzzy:
+                    read_plate, plate = plate, parkease.resolve_plate(plate, my_args.fuzzy)
+                    if read_plate != plate:
+                        print(f"Plate {read_plate} read as {plate}.")
                 parked_time, amount_due, sub = parkease.rmv_car(plate)
                 sub_msg = f"Your subscription ends on {sub.end.strftime('%d/%m/%Y')}.\n" if sub is not None else ""
                 print(f"Car with plate {plate} removed.\nYou are staying {parked_time.days} days and {int(parked_time.seconds / 3600)} hours.\n{sub_msg}The amount to be paid is €{amount_due}.")
+                for e in parkease.log_errors:
+                    print(f"Warning: the stay is not saved in the ticket log. {e}")
         except Exception as e:
             print(e)
 
@@ -92,15 +107,82 @@ def main(my_args):
             else:
                 print("No active subscription.")
 
+    if my_args.reservation:
+        plate, start, end = my_args.reservation
+        try:
+            reservation = parkease.reserve(plate, datetime.strptime(start, '%d/%m/%Y-%H:%M'), datetime.strptime(end, '%d/%m/%Y-%H:%M'))
+            print(f"Space reserved.\n{reservation}")
+        except Exception as e:
+            print(e)
+
+    if my_args.expire_sweep:
+        expired, renewals, stats = parkease.sweep_subscriptions()
+        print("Expired subscriptions:")
+        for plate, end in expired:
+            print(f"{plate} (ended on {end.strftime('%d/%m/%Y')})")
+        print(f"Subscriptions to renew (ending in less than {RENEWAL_NOTICE_DAYS} days):")
+        for plate, end in renewals:
+            print(f"{plate} (ends on {end.strftime('%d/%m/%Y')})")
+        print(f"{stats['expired']} expired, {stats['renewals']} to renew, {stats['stale']} outdated entries skipped, {stats['scheduled']} still scheduled.")
+
     if my_args.spaces:
         print(parkease)
 
+    if my_args.archive is not None:
+        # The segments are written before data.json so a crash can only duplicate tickets, never lose them
+        archived = archive_writer(parkease.archive_tickets(datetime.now() - timedelta(days=my_args.archive)))
+        print(f"{archived} tickets older than {my_args.archive} days archived.")
+
+    if my_args.backfill_log:
+        # Stays already in the log are skipped, so the migration can be run again safely
+        written, skipped = TicketLog().backfill(parkease.completed_stays(archive_reader()))
+        print(f"{written} stays added to the ticket log.")
+        if skipped:
+            print(f"{skipped} stays skipped, their plate is longer than {PLATE_MAX_LENGTH} characters.")
+
     if my_args.report:
         report = Report(parkease)
-        report.add_data()
+        if my_args.from_log:
+            with TicketLog() as log:
+                report.add_log(log)
+        else:
+            report.add_data(archive_reader() if my_args.all_time else ())
         print(report)
 
-    json_writer(parkease)
+    if my_args.forecast is not None:
+        forecast = Forecast.from_dict(json_reader(FORECAST_FILE)) if os.path.exists(FORECAST_FILE) else Forecast()
+        # Only the stays logged since the last forecast are read
+        with TicketLog() as log:
+            forecast.update(log)
+        json_writer(forecast, FORECAST_FILE)
+        occupancy, time_to_full = Report(parkease).forecast(forecast, my_args.forecast)
+        for hours, occupied in enumerate(occupancy, 1):
+            print(f"In {hours}h: {min(round(occupied), parkease.spaces)}/{parkease.spaces} spaces occupied.")
+        print("The parking lot is not expected to be full." if time_to_full is None else f"The parking lot is expected to be full in {time_to_full}h.")
+
+    if my_args.export:
+        kind, path = my_args.export
+        start = None if my_args.start is None else datetime.strptime(my_args.start, '%d/%m/%Y')
+        end = None if my_args.end is None else datetime.strptime(my_args.end, '%d/%m/%Y')
+        if kind == 'tickets':
+            written = csv_writer(path, TICKET_HEADER, ticket_rows(parkease, archive_reader(start=start, end=end), start, end), my_args.gzip)
+        elif kind == 'stays':
+            with TicketLog() as log:
+                written = csv_writer(path, STAY_HEADER, stay_rows(log, start, end), my_args.gzip)
+        else:
+            report = Report(parkease)
+            if my_args.from_log:
+                with TicketLog() as log:
+                    report.add_log(log)
+            else:
+                report.add_data(archive_reader() if my_args.all_time else ())
+            written = csv_writer(path, REPORT_HEADER, report_rows(report), my_args.gzip)
+        print(f"{written} rows exported to {path}.")
+
+    if sharded:
+        shard_writer(parkease)
+    else:
+        json_writer(parkease)
 
 
 if __name__ == '__main__':
@@ -119,9 +201,22 @@ if __name__ == '__main__':
 
     parser = argparse.ArgumentParser(prog='main.py', description='Parking manager')
     parser.add_argument('-m', '--management', nargs=2, type=str, help='First value, the state of the car you want to manage: ["in", "out"], second value, his plate: str')
+    parser.add_argument('-f', '--fuzzy', type=int, choices=range(1, PLATE_INDEX_DISTANCE + 1), help='Number of misread characters tolerated in the plate of a car going out.')
     parser.add_argument('-s', '--spaces', action='store_true', help='Show how many spaces are available.')
     parser.add_argument('-sub', '--subscription', type=str, help='Requires the plate number of the car for which you want to manipulate the subscription.')
+    parser.add_argument('-res', '--reservation', nargs=3, type=str, metavar=('PLATE', 'START', 'END'), help='Reserves a space for a car, the dates are formatted as dd/mm/yyyy-hh:mm.')
+    parser.add_argument('--expire-sweep', action='store_true', help='Lists the subscriptions that expired since the last sweep and the ones to renew soon.')
     parser.add_argument('-r', '--report', action='store_true', help='Generates a report showing the current state of the parking lot at the time the command is executed.')
+    parser.add_argument('-a', '--archive', nargs='?', type=int, const=ARCHIVE_HORIZON_DAYS, help=f'Moves the tickets older than this number of days (default: {ARCHIVE_HORIZON_DAYS}) to the compressed archive.')
+    parser.add_argument('--all-time', action='store_true', help='Includes the archived tickets in the report.')
+    parser.add_argument('--from-log', action='store_true', help='Builds the report from the binary ticket log of the completed stays.')
+    parser.add_argument('--backfill-log', action='store_true', help='Adds the completed stays of data/data.json and of the archive to the ticket log, once before using --from-log, --forecast or --export stays.')
+    parser.add_argument('--forecast', nargs='?', type=int, const=24, choices=range(1, FORECAST_MAX_HOURS + 1), metavar='HOURS', help=f'Predicts the occupancy for the next hours (default: 24, max: {FORECAST_MAX_HOURS}) from the ticket log.')
+    parser.add_argument('-e', '--export', nargs=2, metavar=('KIND', 'PATH'), help='Exports to a CSV file: "tickets" (with the archive), "stays" (completed stays of the ticket log, with their amount) or "report".')
+    parser.add_argument('--start', type=str, help='Exports only the tickets and stays arrived from this date (dd/mm/yyyy).')
+    parser.add_argument('--end', type=str, help='Exports only the tickets and stays arrived before this date (dd/mm/yyyy).')
+    parser.add_argument('--gzip', action='store_true', help='Compresses the exported file with gzip.')
+    parser.add_argument('--shards', action='store_true', help=f'Moves the cars from data/data.json to {SHARD_COUNT} shard files, only the shards of the changed cars are then rewritten.')
     args = parser.parse_args()
 
 
@@ -135,4 +230,7 @@ if __name__ == '__main__':
         except argparse.ArgumentTypeError as e:
             parser.error(str(e))
 
+    if args.export and args.export[0] not in ['tickets', 'stays', 'report']:
+        parser.error('The first value of --export must be one of the choices : ["tickets", "stays", "report"]')
+
     main(args)
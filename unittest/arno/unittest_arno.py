@@ -41,6 +41,12 @@ class TestTicket(unittest.TestCase):
         parked_time = ticket.parked_time
         self.assertGreaterEqual(parked_time.total_seconds(), 2 * 3600)
 
+    def test_ticket_close(self):
+        ticket = Ticket("CLOSE1", datetime.now() - timedelta(hours=3))
+        ticket.close()
+        self.assertIsNotNone(ticket.departure)
+        self.assertEqual(Ticket.from_dict(ticket.to_dict()).departure, ticket.departure)
+
 class TestCar(unittest.TestCase):
 
     def test_car_initialization_with_defaults(self):
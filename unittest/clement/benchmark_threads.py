@@ -0,0 +1,62 @@
+""" Throughput of the gate events with several threads: ThreadSafeParking against the same parking behind a single global lock.
+
+Run from the root of the project: python unittest/clement/benchmark_threads.py [threads] [events per thread]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from libs.parking import *
+
+
+class GlobalLockParking(ThreadSafeParking):
+    """ Same storage as ThreadSafeParking, but every gate event waits for the same lock (its own locks are then never contended). """
+
+    def __init__(self, *args, **kwargs):
+        self._lock = threading.RLock()
+        super().__init__(*args, **kwargs)
+
+    def add_car(self, plate):
+        with self._lock:
+            super().add_car(plate)
+
+    def rmv_car(self, plate, max_distance=0):
+        with self._lock:
+            return super().rmv_car(plate, max_distance)
+
+    def av_spaces(self):
+        with self._lock:
+            return super().av_spaces()
+
+
+def gate_events(parking, thread, events):
+    # Each thread drives its own cars, half of the parking lot stays occupied by the other threads
+    plates = [f"T{thread}-{n}" for n in range(20)]
+    for n in range(events):
+        plate = plates[n % len(plates)]
+        try:
+            parking.add_car(plate)
+        except ValueError:
+            parking.rmv_car(plate)
+
+
+def benchmark(parking_class, threads, events):
+    parking = parking_class(spaces=threads * 20, alerts=OccupancyMonitor(AlertDispatcher([]), 0, 0))
+    workers = [threading.Thread(target=gate_events, args=(parking, i, events)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    return threads * events / elapsed
+
+
+if __name__ == '__main__':
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    print(f"{threads} threads, {events} events per thread")
+    for parking_class in [GlobalLockParking, ThreadSafeParking]:
+        print(f"{parking_class.__name__}: {benchmark(parking_class, threads, events):.0f} events/s")
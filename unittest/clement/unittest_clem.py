@@ -1,4 +1,10 @@
 import unittest
+import gzip
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from libs.file_mngt import *
 from libs.parking import *
 
 
@@ -39,6 +45,11 @@ class TestParking(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.parking.add_car(plate)
 
+    def test_add_car_plate_too_long(self):
+        with self.assertRaises(ValueError):
+            self.parking.add_car('X' * (PLATE_MAX_LENGTH + 1))
+        self.assertEqual(self.parking.all_cars, [])
+
     def test_add_car_from_cars_out(self):
         self.parking.add_car('CAR1')
         self.parking.rmv_car('CAR1')
@@ -58,7 +69,7 @@ class TestParking(unittest.TestCase):
             self.parking.rmv_car("DOESNT_EXIST")
 
     def test_to_dict(self):
-        self.assertDictEqual(Parking().to_dict(), {'cars_in': [], 'cars_out': [], 'spaces': 192}, "Conversion d'un parking vide en dict.")
+        self.assertDictEqual(Parking().to_dict(), {'cars_in': [], 'cars_out': [], 'spaces': 192, 'reservations': [], 'sub_schedule': [], 'alert_state': {'alerted': False, 'last_event': None}}, "Conversion d'un parking vide en dict.")
 
     def test_from_dict(self):
         data = {
@@ -77,6 +88,450 @@ class TestParking(unittest.TestCase):
         self.parking.new_car('CAR1')
         self.assertEqual(len(self.parking._cars_out), 1)
 
+    def test_archive_tickets(self):
+        old = datetime.now() - timedelta(days=400)
+        self.parking._cars_out.append(Car('OLD', [Ticket('OLD', old), Ticket('OLD')]))
+        self.parking._cars_in.append(Car('IN', [Ticket('IN', old)]))
+        archived = self.parking.archive_tickets(datetime.now() - timedelta(days=365))
+        self.assertEqual(len(archived), 1)
+        self.assertEqual(self.parking._cars_out[0].archived, 1)
+        self.assertEqual(len(self.parking._cars_out[0].tickets), 1)
+        self.assertEqual(len(self.parking._cars_in[0].tickets), 1, 'The ticket of a parked car stays in the hot state')
+
+    def test_archive_writer_reader(self):
+        tickets = [Ticket('CAR1', datetime(2023, 1, 5)), Ticket('CAR2', datetime(2023, 2, 5))]
+        with tempfile.TemporaryDirectory() as directory:
+            for compression in SEGMENT_FORMATS:
+                archive_writer(tickets, directory, compression)
+            self.assertEqual(len(list(archive_reader(directory))), 4)
+            self.assertEqual(len(list(archive_reader(directory, start=datetime(2023, 2, 1)))), 2)
+
+    def test_ticket_log(self):
+        ticket = Ticket('LOG1', datetime(2023, 1, 5, 10), datetime(2023, 1, 5, 12))
+        with tempfile.TemporaryDirectory() as directory:
+            log = TicketLog(f'{directory}/tickets.bin')
+            log.append(ticket, 4)
+            log.append(ticket, 6)
+            self.parking.add_car('CAR1')
+            report = Report(self.parking)
+            with log:
+                self.assertEqual(len(log), 2)
+                self.assertEqual(list(log)[0], ('LOG1', 4, ticket.arrival.timestamp(), ticket.departure.timestamp()))
+                report.add_log(log)
+        daily, hours = report.get_daily_report()
+        self.assertEqual(daily[ticket.arrival.date()], 2)
+        self.assertEqual(hours[10], 2)
+        self.assertIn('€10', str(report))
+
+    def test_rmv_car_log(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log = TicketLog(f'{directory}/tickets.bin')
+            self.parking = Parking.from_dict(self.parking.to_dict(), log)
+            self.parking.add_car('CAR1')
+            self.parking.rmv_car('CAR1')
+            # Saved before the plates were limited: checked out, but not logged
+            self.parking._cars_in.append(Car('VERYLONGPLATE1', [Ticket('VERYLONGPLATE1')]))
+            self.parking._parked.add('VERYLONGPLATE1')
+            self.parking.rmv_car('VERYLONGPLATE1')
+            with log:
+                self.assertEqual(list(map(lambda s: s[0], log)), ['CAR1'])
+        self.assertEqual(len(self.parking.log_errors), 1)
+        self.assertEqual(len(self.parking._cars_out), 2)
+
+    def test_ticket_log_backfill(self):
+        self.parking._cars_out.append(Car('OLD', [Ticket('OLD', datetime(2023, 1, 5, 10))]))
+        self.parking._cars_out.append(Car('OUT', [Ticket('OUT', datetime(2023, 1, 6, 10), datetime(2023, 1, 6, 13))]))
+        self.parking._cars_in.append(Car('IN', [Ticket('IN', datetime(2023, 1, 4)), Ticket('IN')]))
+        archived = [Ticket('ARC', datetime(2022, 12, 5)).to_dict()]
+        with tempfile.TemporaryDirectory() as directory:
+            log = TicketLog(f'{directory}/tickets.bin')
+            self.assertEqual(log.backfill(self.parking.completed_stays(archived)), (4, 0))
+            self.assertEqual(log.backfill(self.parking.completed_stays(archived)), (0, 0))
+            with log:
+                stays = list(log)
+                self.assertEqual(log.revenue(), 6)
+                forecast = Forecast()
+                forecast.update(log)
+        self.assertEqual(list(map(lambda s: s[0], stays)), ['ARC', 'IN', 'OLD', 'OUT'])
+        self.assertIsNone(stays[2][3])
+        self.assertEqual(sum(forecast.to_dict()['arrivals']), 4)
+        self.assertEqual(sum(map(sum, forecast.to_dict()['dwell'])), 1)
+
+    def test_find_plate(self):
+        for plate in ['ABC123', 'ABC124', 'XYZ789']:
+            self.parking.add_car(plate)
+        self.assertEqual(self.parking.find_plate('A8C123'), [(1, 'ABC123')])
+        self.assertEqual(self.parking.find_plate('A8C124', 2), [(1, 'ABC124'), (2, 'ABC123')])
+        self.assertEqual(self.parking.find_plate('XYZ78'), [(1, 'XYZ789')])
+        with self.assertRaises(ValueError):
+            self.parking.find_plate('ABC123', PLATE_INDEX_DISTANCE + 1)
+
+    def test_rmv_car_fuzzy(self):
+        self.parking.add_car('ABC123')
+        self.parking.add_car('ABC128')
+        with self.assertRaises(ValueError):
+            self.parking.rmv_car('A8C123')
+        with self.assertRaises(ValueError):
+            self.parking.rmv_car('ABC12', 1)
+        self.parking.rmv_car('A8C123', 1)
+        self.assertEqual(self.parking._cars_out[0].plate, 'ABC123')
+        self.assertEqual(self.parking.find_plate('ABC123'), [(1, 'ABC128')])
+
+    def test_plate_index_lazy(self):
+        self.parking = Parking.from_dict(self.parking.to_dict())
+        self.parking.add_car('ABC123')
+        self.parking.add_car('ABC128')
+        self.parking.rmv_car('ABC128')
+        self.assertIsNone(self.parking._plate_index, 'The exact path never builds the plate index')
+        self.parking.add_car('XYZ789')
+        self.assertEqual(self.parking.resolve_plate('A8C123', 1), 'ABC123')
+        self.parking.rmv_car('XYZ789')
+        self.assertEqual(self.parking.find_plate('XYZ788'), [])
+
+    def test_reserve(self):
+        # Reservations are counted per slot of the timeline, the test uses whole slots
+        start = datetime.fromtimestamp((datetime.now() + timedelta(days=1)).timestamp() // RESERVATION_SLOT * RESERVATION_SLOT)
+        for i in range(20):
+            self.parking.reserve(f"CAR{i}", start, start + timedelta(hours=2))
+        self.assertFalse(self.parking.can_reserve(start + timedelta(hours=1), start + timedelta(hours=3)))
+        self.assertTrue(self.parking.can_reserve(start + timedelta(hours=2), start + timedelta(hours=3)))
+        with self.assertRaises(ParkingFull):
+            self.parking.reserve('LATE', start - timedelta(hours=1), start + timedelta(minutes=1))
+        with self.assertRaises(ValueError):
+            self.parking.reserve('CAR0', start + timedelta(hours=1), start + timedelta(hours=3))
+        self.assertEqual(self.parking.av_spaces(), 20)
+
+    def test_reserve_now(self):
+        now = datetime.now()
+        self.parking.reserve('BOOKED', now - timedelta(minutes=5), now + timedelta(hours=1))
+        for i in range(19):
+            self.parking.add_car(f"CAR{i}")
+        self.assertEqual(self.parking.av_spaces(), 0)
+        with self.assertRaises(ParkingFull):
+            self.parking.add_car('OTHER')
+        self.parking.add_car('BOOKED')
+        self.assertEqual(self.parking.reservations, [])
+
+    def test_reserve_soon(self):
+        self.parking = Parking(spaces=5)
+        now = datetime.now()
+        self.parking.reserve('BOOK', now + timedelta(minutes=16), now + timedelta(hours=2))
+        for i in range(4):
+            self.parking.add_car(f"CAR{i}")
+        with self.assertRaises(ParkingFull):
+            self.parking.add_car('WALKIN')
+        # Arriving before its reservation, the car uses it
+        self.parking.add_car('BOOK')
+        self.assertEqual(self.parking.reservations, [])
+        self.assertEqual(len(self.parking._cars_in), 5)
+
+    def test_reserve_early_arrival(self):
+        self.parking = Parking(spaces=2)
+        now = datetime.now()
+        self.parking.reserve('BOOK', now + timedelta(minutes=30), now + timedelta(hours=2))
+        self.parking.add_car('BOOK')
+        self.assertEqual(self.parking.av_spaces(), 1, 'The space of the car is not counted a second time')
+        self.parking.add_car('WALKIN')
+
+    def test_reserve_physically_full(self):
+        now = datetime.now()
+        self.parking = Parking([Car('IN')], spaces=1, reservations=[Reservation('BOOK', now - timedelta(minutes=5), now + timedelta(hours=1))])
+        with self.assertRaises(ParkingFull):
+            self.parking.add_car('BOOK')
+
+    def test_reservations_to_from_dict(self):
+        start = datetime.now() + timedelta(days=1)
+        self.parking.reserve('CAR1', start, start + timedelta(hours=2))
+        parking = Parking.from_dict(self.parking.to_dict())
+        self.assertEqual(len(parking.reservations), 1)
+        self.assertEqual(parking.reservations[0].plate, 'CAR1')
+        self.assertEqual(parking._timeline.max(0, parking._timeline.size), 1)
+
+    def test_segment_tree(self):
+        tree = SegmentTree(100)
+        tree.add(10, 20, 2)
+        tree.add(15, 30, 1)
+        self.assertEqual(tree.max(0, 10), 0)
+        self.assertEqual(tree.max(0, 100), 3)
+        self.assertEqual(tree.max(20, 25), 1)
+        tree.add(15, 20, -3)
+        self.assertEqual(tree.max(0, 100), 2)
+
+    def test_sweep_subscriptions(self):
+        self.parking.new_car('SHORT').add_sub(1)
+        self.parking.new_car('LONG').add_sub(12)
+        self.parking.new_car('EXTENDED').add_sub(1)
+        self.parking._cars_out[2].extend_sub(11)
+        in_one_month = datetime.now() + timedelta(days=32)
+        expired, renewals, stats = self.parking.sweep_subscriptions(in_one_month)
+        self.assertEqual(list(map(lambda e: e[0], expired)), ['SHORT'])
+        self.assertEqual(renewals, [])
+        self.assertEqual(stats, {'expired': 1, 'renewals': 0, 'stale': 2, 'scheduled': 4})
+        parking = Parking.from_dict(self.parking.to_dict())
+        expired, renewals, stats = parking.sweep_subscriptions(datetime.now() + timedelta(days=362))
+        self.assertEqual(sorted(map(lambda r: r[0], renewals)), ['EXTENDED', 'LONG'])
+        self.assertEqual(stats['scheduled'], 2)
+
+    def test_export_csv(self):
+        self.parking._cars_out.append(Car('OLD', [Ticket('OLD', datetime(2023, 1, 5)), Ticket('OLD', datetime(2023, 3, 5))]))
+        archived = [Ticket('ARC', datetime(2022, 12, 5)).to_dict()]
+        rows = list(ticket_rows(self.parking, archived, start=datetime(2022, 1, 1), end=datetime(2023, 2, 1)))
+        self.assertEqual(list(map(lambda r: r[0], rows)), ['OLD', 'ARC'])
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/tickets.csv.gz'
+            self.assertEqual(csv_writer(path, TICKET_HEADER, ticket_rows(self.parking, archived), True, chunk_size=2), 3)
+            with gzip.open(path, 'rt') as f:
+                self.assertEqual(len(f.readlines()), 4)
+
+    def test_forecast(self):
+        monday = datetime(2024, 1, 1, 8)
+        with tempfile.TemporaryDirectory() as directory:
+            log = TicketLog(f'{directory}/tickets.bin')
+            # Two weeks with 2 cars arriving on Monday at 8h and staying 3 hours
+            for week in range(2):
+                for _ in range(2):
+                    arrival = monday + timedelta(weeks=week)
+                    log.append(Ticket('CAR', arrival, arrival + timedelta(hours=3)), 6)
+            forecast = Forecast()
+            with log:
+                forecast.update(log)
+            self.assertEqual(forecast.arrival_rates()[8], 2)
+            self.assertEqual(forecast.survival(8)[:5], [1.0, 1.0, 1.0, 1.0, 0.0])
+
+            self.parking = Parking(spaces=2)
+            occupancy = forecast.predict(self.parking, 5, monday + timedelta(weeks=2, hours=-1))
+            self.assertEqual(occupancy, [0, 2, 2, 2, 0])
+            self.assertEqual(forecast.time_to_full(self.parking, 5, monday + timedelta(weeks=2, hours=-1)), 2)
+
+            log.append(Ticket('CAR', monday + timedelta(weeks=2), monday + timedelta(weeks=2, hours=1)), 2)
+            with log:
+                forecast = Forecast.from_dict(forecast.to_dict())
+                forecast.update(log)
+            self.assertEqual(forecast.records, 5)
+            self.assertEqual(sum(forecast.to_dict()['arrivals']), 5)
+
+    def test_dirty(self):
+        self.parking.add_car('CAR1')
+        self.parking.new_car('CAR2').add_sub(1)
+        self.assertEqual(self.parking.dirty, {'CAR1', 'CAR2'})
+        self.assertEqual(self.parking.dirty_state, {'sub_schedule'})
+        self.parking.clear_dirty({'CAR2'}, set())
+        self.assertEqual(self.parking.dirty, {'CAR1'})
+        self.parking.clear_dirty()
+        self.parking.rmv_car('CAR1')
+        self.assertEqual(self.parking.dirty, {'CAR1'})
+        self.assertEqual(self.parking.dirty_state, set())
+        self.parking.reserve('CAR3', datetime.now() + timedelta(days=1), datetime.now() + timedelta(days=2))
+        self.assertEqual(self.parking.dirty_state, {'reservations'})
+
+    def assertShardsEqual(self, data):
+        # The cars out are read shard after shard, their order is not kept
+        expected = self.parking.to_dict()
+        self.assertCountEqual(data.pop('cars_out'), expected.pop('cars_out'))
+        self.assertEqual(data, expected)
+
+    def test_shard_writer_reader(self):
+        self.parking.add_car('CAR1')
+        self.parking.add_car('CAR2')
+        self.parking.rmv_car('CAR2')
+        self.parking.new_car('CAR3').add_sub(1)
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertEqual(shard_writer(self.parking, directory, 8), 8)
+            self.assertEqual(self.parking.dirty, set())
+            self.assertShardsEqual(shard_reader(directory))
+
+            self.parking.add_car('CAR2')
+            # A gate event rewrites one shard and the manifest, not the subscription schedule
+            self.assertEqual(self.parking.dirty_state, set())
+            self.assertEqual(shard_writer(self.parking, directory), 1)
+            self.assertEqual(json_reader(f'{directory}/manifest.json'), {'cars_in': ['CAR1', 'CAR2'], 'spaces': 20, 'shards': 8})
+            self.assertEqual(shard_car('CAR2', directory), self.parking.get_car('CAR2').to_dict())
+            self.assertShardsEqual(shard_reader(directory))
+            self.assertIsNone(shard_car('UNKNOWN', directory))
+
+    def test_shard_reader_plates(self):
+        for plate in ['CAR1', 'CAR2']:
+            self.parking.add_car(plate)
+        self.parking.new_car('CAR3').add_sub(1)
+        with tempfile.TemporaryDirectory() as directory:
+            shard_writer(self.parking, directory, 8)
+            parking = Parking.from_dict(shard_reader(directory, ['CAR2']))
+            self.assertEqual(parking.av_spaces(), 18)
+            self.assertEqual(len(parking.get_car('CAR2').tickets), 1)
+            parking.rmv_car('CAR2')
+            self.assertEqual(shard_writer(parking, directory), 1)
+
+            self.parking.rmv_car('CAR2')
+            data = shard_reader(directory)
+            self.assertEqual(data['sub_schedule'], self.parking.to_dict()['sub_schedule'])
+            self.assertEqual(data['cars_in'], [self.parking.get_car('CAR1').to_dict()])
+            self.assertIsNotNone(next(filter(lambda c: c['plate'] == 'CAR2', data['cars_out']))['tickets'][0]['departure'])
+
+    def test_shard_writer_crash(self):
+        from libs.file_mngt import shard_mngt
+        self.parking.add_car('CAR1')
+        with tempfile.TemporaryDirectory() as directory:
+            shard_writer(self.parking, directory, 8)
+            self.parking.rmv_car('CAR1')
+            self.parking.add_car('CAR2')
+            apply = shard_mngt._apply
+
+            def crash(directory, files):
+                # Only the first file is replaced before the crash
+                apply(directory, dict(list(files.items())[:1]))
+                raise OSError('crash')
+            shard_mngt._apply = crash
+            try:
+                with self.assertRaises(OSError):
+                    shard_writer(self.parking, directory)
+            finally:
+                shard_mngt._apply = apply
+            self.assertShardsEqual(shard_reader(directory))
+
+    def test_alert_hysteresis(self):
+        alerts = []
+        parking = Parking(num_of_floors=2, spaces_per_floor=10, alerts=OccupancyMonitor(AlertDispatcher([CallbackSink(alerts.append)]), 0.1, 0.2, 0))
+        for i in range(19):
+            parking.add_car(f"CAR{i}")
+        parking.rmv_car('CAR0')
+        parking.add_car('CAR0')
+        for i in range(4):
+            parking.rmv_car(f"CAR{i}")
+        parking.alerts.dispatcher.close()
+        self.assertEqual(list(map(lambda a: a.kind, alerts)), ['alert', 'clear'])
+
+    def test_alert_state_saved(self):
+        alerts = []
+        parking = Parking(num_of_floors=2, spaces_per_floor=10, alerts=OccupancyMonitor(AlertDispatcher([]), 0.1, 0.2, 60))
+        for i in range(18):
+            parking.add_car(f"CAR{i}")
+        self.assertEqual(parking.dirty_state, {'alert_state'})
+        parking.rmv_car('CAR0')
+        # A new run, between the two thresholds: still in alert, and the rate limit still applies
+        data = parking.to_dict()
+        parking = Parking.from_dict(data)
+        self.assertTrue(parking.alerts.alerted)
+        parking._alerts = OccupancyMonitor(AlertDispatcher([CallbackSink(alerts.append)]), 0.1, 0.2, 60)
+        parking._alerts.load(data['alert_state'])
+        for i in range(1, 4):
+            parking.rmv_car(f"CAR{i}")
+        parking.alerts.dispatcher.close()
+        self.assertEqual(alerts, [], 'The clear waits for the end of the minimum interval')
+
+    def test_alert_no_spaces(self):
+        parking = Parking(spaces=0)
+        self.assertTrue(parking.alerts.alerted)
+        self.assertEqual(parking.av_spaces(), 0)
+
+    def test_alert_slow_sink(self):
+        parking = Parking(num_of_floors=1, spaces_per_floor=10, alerts=OccupancyMonitor(AlertDispatcher([CallbackSink(lambda a: time.sleep(0.5))]), 0.1, 0.1, 0))
+        for i in range(9):
+            parking.add_car(f"CAR{i}")
+        start = time.perf_counter()
+        parking.add_car('CAR9')
+        parking.rmv_car('CAR9')
+        parking.add_car('CAR9')
+        self.assertLess(time.perf_counter() - start, 0.1, 'add_car must not wait for the sinks')
+        parking.alerts.dispatcher.close(0)
+
+
+class TestThreadSafeParking(unittest.TestCase):
+    def setUp(self):
+        self.parking = ThreadSafeParking(num_of_floors=2, spaces_per_floor=25)
+
+    def run_threads(self, target, count=16):
+        errors = []
+
+        def run(i):
+            try:
+                target(i)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_same_behaviour(self):
+        self.parking.add_car('CAR1')
+        self.parking.add_car('CAR2')
+        self.parking.rmv_car('CAR1')
+        self.parking.add_car('CAR1')
+        self.assertEqual(self.parking.av_spaces(), 48)
+        self.assertEqual(len(self.parking.all_cars), 2)
+        with self.assertRaises(ValueError):
+            self.parking.add_car('CAR2')
+        parking = ThreadSafeParking.from_dict(self.parking.to_dict())
+        self.assertEqual(parking.av_spaces(), 48)
+
+    def test_stress(self):
+        def enter_and_leave(i):
+            for n in range(200):
+                plate = f"T{i}-{n % 5}"
+                try:
+                    self.parking.add_car(plate)
+                except ParkingFull:
+                    continue
+                self.assertGreaterEqual(self.parking.av_spaces(), 0)
+                self.parking.rmv_car(plate)
+        self.assertEqual(self.run_threads(enter_and_leave), [])
+        self.assertEqual(self.parking.av_spaces(), 50)
+        self.assertEqual(len(self.parking._cars_in), 0)
+        self.assertEqual(len(self.parking._cars_out), 16 * 5)
+
+    def test_snapshots_during_gate_events(self):
+        self.parking.add_car('X')
+        self.parking.rmv_car('X')
+        missing = []
+
+        def run(i):
+            for n in range(2000):
+                if i == 0:
+                    self.parking.add_car('X')
+                    self.parking.rmv_car('X')
+                elif i == 1:
+                    data = self.parking.to_dict()
+                    if 'X' not in map(lambda c: c['plate'], data['cars_in'] + data['cars_out']):
+                        missing.append(data)
+                elif self.parking.get_car('X') is None:
+                    missing.append(None)
+        self.assertEqual(self.run_threads(run, 3), [])
+        self.assertEqual(len(missing), 0, 'The car is always in cars_in or cars_out')
+
+    def test_log_from_threads(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log = TicketLog(f'{directory}/tickets.bin')
+            self.parking = ThreadSafeParking(spaces=50, log=log)
+            self.assertEqual(self.run_threads(lambda i: [(self.parking.add_car(f"T{i}-{n}"), self.parking.rmv_car(f"T{i}-{n}")) for n in range(20)]), [])
+            with log:
+                self.assertEqual(len(set(map(lambda s: s[0], log))), 16 * 20)
+
+    def test_capacity_is_never_exceeded(self):
+        errors = self.run_threads(lambda i: [self.parking.add_car(f"T{i}-{n}") for n in range(10)])
+        self.assertEqual(len(self.parking._cars_in), 50)
+        self.assertEqual(self.parking.av_spaces(), 0)
+        self.assertTrue(all(map(lambda e: isinstance(e, ParkingFull), errors)))
+
+    def test_add_sub_race(self):
+        errors = self.run_threads(lambda i: self.parking.add_sub('SUB', 1))
+        self.assertEqual(len(errors), 15, 'Only one thread can add the subscription')
+        self.assertEqual(len(self.parking.sweep_subscriptions(datetime.now() + timedelta(days=40))[0]), 1)
+
+
+    def test_read_while_reserving(self):
+        start = datetime.now() + timedelta(days=1)
+
+        def run(i):
+            for n in range(5 if i % 2 else 200):
+                if i % 2:
+                    self.parking.reserve(f"R{i}-{n}", start, start + timedelta(hours=2))
+                else:
+                    self.parking.reservations
+                    self.parking.find_plate('R1-0')
+        self.assertEqual(self.run_threads(run), [])
+        self.assertEqual(len(self.parking.reservations), 40)
 
 if __name__ == '__main__':
     unittest.main()